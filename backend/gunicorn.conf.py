@@ -0,0 +1,41 @@
+"""Профиль запуска API в несколько воркеров: gunicorn + uvicorn.
+
+Запуск из каталога backend:
+
+    gunicorn -c gunicorn.conf.py server:app
+
+Каждый воркер — отдельный процесс со своим event loop, своим клиентом
+MongoDB (создается в startup-хуке, после fork) и своим прогретым пулом.
+Суммарное число соединений с MongoDB: WEB_CONCURRENCY * MONGO_MAX_POOL_SIZE,
+оно должно укладываться в лимит соединений mongod.
+
+Кэш чтения и буфер счетчиков использования живут внутри воркера; чтобы
+воркеры видели записи друг друга, включите CACHE_CHANGE_STREAMS=1
+(требуется replica set). Без change stream кэш устаревает не дольше
+CACHE_TTL, а индекс автодополнения догоняет чужие записи опросом раз в
+AUTOCOMPLETE_SYNC_INTERVAL секунд (удаления — раз в
+AUTOCOMPLETE_RECONCILE_INTERVAL).
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8001")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Приложение загружается в каждом воркере отдельно: клиент MongoDB и фоновые
+# задачи не должны создаваться до fork
+preload_app = False
+
+# Держим keep-alive дольше, чем балансировщик перед нами, чтобы не ловить 502
+keepalive = int(os.environ.get("KEEPALIVE", "75"))
+timeout = int(os.environ.get("WORKER_TIMEOUT", "60"))
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", "30"))
+
+# Плавный перезапуск воркеров против утечек памяти; jitter разносит рестарты
+max_requests = int(os.environ.get("MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.environ.get("MAX_REQUESTS_JITTER", "1000"))
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.environ.get("LOG_LEVEL", "info")
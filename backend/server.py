@@ -1,23 +1,243 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import IndexModel, ReturnDocument, UpdateOne, ASCENDING, DESCENDING, HASHED, TEXT
+from pymongo import monitoring, read_preferences
+from pymongo.errors import BulkWriteError, ConnectionFailure, OperationFailure
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, ValidationError
+from typing import List, Optional, Union
 import uuid
-from datetime import datetime
+import csv
+import codecs
+import io
+import json
+import asyncio
+import base64
+import bisect
+import collections
+import heapq
+import itertools
+import re
+import hashlib
+import orjson
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
 
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Метрики в формате Prometheus: задержки HTTP-маршрутов и команд MongoDB
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "100"))
+
+class Histogram:
+    """Гистограмма с метками; потокобезопасна, т.к. Motor вызывает слушателей из пула потоков"""
+
+    def __init__(self, name: str, help_text: str, label_names: tuple, buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for labels, series in sorted(self.series.items()):
+                label_text = format_labels(self.label_names, labels)
+                for bound, count in zip(self.buckets, series["buckets"]):
+                    lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {series["count"]}')
+                lines.append(f"{self.name}_sum{{{label_text}}} {series['sum']}")
+                lines.append(f"{self.name}_count{{{label_text}}} {series['count']}")
+        return lines
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def inc(self, labels: tuple, value: float = 1):
+        with self.lock:
+            self.series[labels] = self.series.get(labels, 0) + value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for labels, value in sorted(self.series.items()):
+                lines.append(f"{self.name}{{{format_labels(self.label_names, labels)}}} {value}")
+        return lines
+
+def format_labels(label_names: tuple, labels: tuple) -> str:
+    def escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return ",".join(f'{name}="{escape(value)}"' for name, value in zip(label_names, labels))
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")
+)
+mongo_command_duration = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command duration", ("collection", "command")
+)
+mongo_documents_returned = Counter(
+    "mongo_documents_returned_total", "Documents returned by MongoDB commands", ("collection", "command")
+)
+mongo_command_failures = Counter(
+    "mongo_command_failures_total", "Failed MongoDB commands", ("collection", "command")
+)
+
+class MongoMetricsListener(monitoring.CommandListener):
+    """Длительность команд MongoDB по коллекциям и операциям, лог медленных запросов"""
+
+    def __init__(self):
+        self.pending = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        if not isinstance(collection, str):
+            collection = ""
+        self.pending[(event.connection_id, event.request_id)] = (collection, event.command)
+
+    def succeeded(self, event):
+        collection, command = self.pending.pop((event.connection_id, event.request_id), ("", None))
+        labels = (collection, event.command_name)
+        duration_ms = event.duration_micros / 1000
+        mongo_command_duration.observe(labels, duration_ms / 1000)
+        cursor = event.reply.get("cursor")
+        if cursor:
+            mongo_documents_returned.inc(labels, len(cursor.get("firstBatch", cursor.get("nextBatch", []))))
+        if duration_ms >= SLOW_QUERY_MS and command is not None:
+            logger.warning(
+                "Slow MongoDB command %s on %s took %.1f ms: %s",
+                event.command_name, collection, duration_ms,
+                {k: v for k, v in command.items() if k in ("filter", "sort", "pipeline", "q", "query")}
+            )
+
+    def failed(self, event):
+        collection, _ = self.pending.pop((event.connection_id, event.request_id), ("", None))
+        mongo_command_failures.inc((collection, event.command_name))
+        mongo_command_duration.observe((collection, event.command_name), event.duration_micros / 1_000_000)
+
+class MetricsMiddleware:
+    """ASGI-middleware: задержка каждого запроса по шаблону маршрута (до отправки последнего байта)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            http_request_duration.observe(
+                (scope["method"], route.path if route else "unmatched", str(status["code"])),
+                time.perf_counter() - started
+            )
+
+# MongoDB connection. Клиент создается при старте каждого воркера (а не при
+# импорте), чтобы пул соединений не наследовался через fork при preload.
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+MONGO_DB_NAME = os.environ['DB_NAME']
+MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", "10"))
+MONGO_MAX_IDLE_TIME_MS = int(os.environ.get("MONGO_MAX_IDLE_TIME_MS", "300000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.environ.get("MONGO_SOCKET_TIMEOUT_MS", "30000"))
+# zstd требует пакет zstandard (есть в requirements); snappy (python-snappy) можно
+# добавить в список, только установив пакет, иначе PyMongo предупреждает при старте
+MONGO_COMPRESSORS = os.environ.get("MONGO_COMPRESSORS", "zstd,zlib")
+# Предпочтение чтения для некэшируемых GET-маршрутов (потоки NDJSON, экспорт,
+# поиск, аналитика). Записи и заполнение кэша чтения всегда идут на primary:
+# иначе первый GET после записи мог бы закэшировать устаревшую копию с secondary.
+MONGO_READ_PREFERENCE = os.environ.get("MONGO_READ_PREFERENCE", "primary")
+MONGO_MAX_STALENESS_SECONDS = int(os.environ.get("MONGO_MAX_STALENESS_SECONDS", "-1"))
+MONGO_WARMUP_CONNECTIONS = int(os.environ.get("MONGO_WARMUP_CONNECTIONS", str(MONGO_MIN_POOL_SIZE)))
+
+READ_PREFERENCES = {
+    "primary": read_preferences.Primary,
+    "primaryPreferred": read_preferences.PrimaryPreferred,
+    "secondary": read_preferences.Secondary,
+    "secondaryPreferred": read_preferences.SecondaryPreferred,
+    "nearest": read_preferences.Nearest,
+}
+
+client = None
+db = None
+read_db = None
+
+def create_mongo_client() -> AsyncIOMotorClient:
+    """Клиент Motor с настройками пула, таймаутов и сжатия из окружения"""
+    return AsyncIOMotorClient(
+        mongo_url,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+        waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+        socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+        compressors=MONGO_COMPRESSORS,
+        event_listeners=[MongoMetricsListener()],
+    )
+
+def read_preference():
+    if MONGO_READ_PREFERENCE not in READ_PREFERENCES:
+        raise RuntimeError(f"Unknown MONGO_READ_PREFERENCE: {MONGO_READ_PREFERENCE}")
+    if MONGO_READ_PREFERENCE == "primary":
+        return read_preferences.Primary()
+    return READ_PREFERENCES[MONGO_READ_PREFERENCE](max_staleness=MONGO_MAX_STALENESS_SECONDS)
+
+def bind_database(mongo_client, db_name: str):
+    """Назначить клиент и базы: db для записей и кэшируемых чтений (primary), read_db для остальных GET"""
+    global client, db, read_db
+    client = mongo_client
+    db = mongo_client[db_name]
+    read_db = mongo_client.get_database(db_name, read_preference=read_preference())
 
 # Create the main app without a prefix
 app = FastAPI()
@@ -25,6 +245,87 @@ app = FastAPI()
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+# Индексы коллекций. Создаются идемпотентно при старте приложения.
+# Уникальный индекс по id обслуживает все операции над одним документом,
+# составные индексы повторяют форму фильтров и сортировок списков
+# (включая keyset-пагинацию по (поле, id)). Полнотекстовые индексы
+# используют морфологию русского языка (стемминг) и веса полей для
+# ранжирования; MongoDB поддерживает их в актуальном состоянии сама.
+INDEXES = {
+    "objections": [
+        IndexModel([("id", ASCENDING)], name="objections_id", unique=True),
+        # Ключ upsert при импорте строк без id
+        IndexModel([("title", ASCENDING)], name="objections_title"),
+        IndexModel([("updated_at", DESCENDING), ("id", DESCENDING)], name="objections_updated"),
+        IndexModel(
+            [("category", ASCENDING), ("updated_at", DESCENDING), ("id", DESCENDING)],
+            name="objections_category_updated",
+        ),
+        IndexModel(
+            [("is_favorite", ASCENDING), ("updated_at", DESCENDING), ("id", DESCENDING)],
+            name="objections_favorite_updated",
+        ),
+        IndexModel(
+            [("title", TEXT), ("tags", TEXT), ("responses.text", TEXT)],
+            name="objections_text",
+            weights={"title": 10, "tags": 5, "responses.text": 1},
+            default_language="russian",
+        ),
+    ],
+    "quotes": [
+        IndexModel([("id", ASCENDING)], name="quotes_id", unique=True),
+        # Ключ upsert при импорте строк без id; тексты длинные, поэтому хэшированный индекс
+        IndexModel([("text", HASHED)], name="quotes_text_hashed"),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="quotes_created"),
+        IndexModel(
+            [("category", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            name="quotes_category_created",
+        ),
+        IndexModel(
+            [("text", TEXT), ("author", TEXT)],
+            name="quotes_text",
+            weights={"text": 1, "author": 3},
+            default_language="russian",
+        ),
+    ],
+    "usage_rollups": [
+        IndexModel(
+            [("dimension", ASCENDING), ("key", ASCENDING), ("granularity", ASCENDING), ("bucket", ASCENDING)],
+            name="usage_rollups_bucket", unique=True,
+        ),
+        IndexModel(
+            [("dimension", ASCENDING), ("granularity", ASCENDING), ("bucket", ASCENDING)],
+            name="usage_rollups_window",
+        ),
+        # Почасовые бакеты удаляются по TTL, дневные (без expires_at) хранятся всегда
+        IndexModel([("expires_at", ASCENDING)], name="usage_rollups_ttl", expireAfterSeconds=0),
+    ],
+    "status_checks": [
+        IndexModel([("id", ASCENDING)], name="status_checks_id", unique=True),
+        IndexModel([("timestamp", DESCENDING), ("id", DESCENDING)], name="status_checks_timestamp"),
+    ],
+}
+
+# Горячие запросы, план которых проверяется через explain() при старте:
+# (коллекция, фильтр, сортировка)
+HOT_QUERIES = [
+    ("objections", {"id": ""}, None),
+    ("objections", {"title": ""}, None),
+    ("objections", {}, [("updated_at", -1), ("id", -1)]),
+    ("objections", {"category": ""}, [("updated_at", -1), ("id", -1)]),
+    ("objections", {"is_favorite": True}, [("updated_at", -1), ("id", -1)]),
+    ("quotes", {"id": ""}, None),
+    ("quotes", {"text": ""}, None),
+    ("quotes", {}, [("created_at", -1), ("id", -1)]),
+    ("quotes", {"category": ""}, [("created_at", -1), ("id", -1)]),
+    ("status_checks", {}, [("timestamp", -1), ("id", -1)]),
+    ("usage_rollups", {"dimension": "objection", "granularity": "day", "bucket": {"$gte": datetime(2000, 1, 1)}}, None),
+]
+
+INDEX_SELF_CHECK = os.environ.get("INDEX_SELF_CHECK", "1") != "0"
+
+TEXT_SCORE_PROJECTION = {"score": {"$meta": "textScore"}}
+
 
 # Define Models for Objections
 class ObjectionResponse(BaseModel):
@@ -49,6 +350,16 @@ class ObjectionCreate(BaseModel):
     category: Optional[str] = None
     tags: List[str] = Field(default_factory=list)
 
+# Облегченная запись для списков: без текстов ответов
+class ObjectionSummary(BaseModel):
+    id: str
+    title: str
+    category: Optional[str] = None
+    tags: List[str] = Field(default_factory=list)
+    is_favorite: bool = Field(default=False)
+    usage_count: int = Field(default=0)
+    updated_at: datetime
+
 class ObjectionUpdate(BaseModel):
     title: Optional[str] = None
     responses: Optional[List[str]] = None
@@ -56,6 +367,17 @@ class ObjectionUpdate(BaseModel):
     tags: Optional[List[str]] = None
     is_favorite: Optional[bool] = None
 
+class ObjectionResponseCreate(BaseModel):
+    text: str
+    # Позиция вставки в списке ответов; без нее ответ добавляется в конец
+    position: Optional[int] = Field(default=None, ge=0)
+
+class ObjectionResponseUpdate(BaseModel):
+    text: str
+
+class ObjectionResponseMove(BaseModel):
+    position: int = Field(ge=0)
+
 class Quote(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     text: str
@@ -68,6 +390,13 @@ class QuoteCreate(BaseModel):
     author: str
     category: Optional[str] = None
 
+# Строки массового импорта: id необязателен, без него запись ищется по заголовку/тексту
+class ObjectionImport(ObjectionCreate):
+    id: Optional[str] = None
+
+class QuoteImport(QuoteCreate):
+    id: Optional[str] = None
+
 # Legacy models for status check
 class StatusCheck(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -77,6 +406,952 @@ class StatusCheck(BaseModel):
 class StatusCheckCreate(BaseModel):
     client_name: str
 
+# Keyset-пагинация и потоковая выдача списков
+MAX_PAGE_SIZE = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(doc: dict, sort_field: str) -> str:
+    """Упаковать позицию последнего документа страницы в непрозрачный курсор"""
+    payload = {"v": doc[sort_field].isoformat(), "id": doc["id"]}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return {"v": datetime.fromisoformat(payload["v"]), "id": str(payload["id"])}
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+
+def keyset_find(collection, query: dict, sort_field: str, cursor: Optional[str],
+                projection: Optional[dict] = None):
+    """Курсор Motor, отсортированный по (sort_field, id) по убыванию и начинающийся после cursor"""
+    if cursor:
+        position = decode_cursor(cursor)
+        after = {"$or": [
+            {sort_field: {"$lt": position["v"]}},
+            {sort_field: position["v"], "id": {"$lt": position["id"]}}
+        ]}
+        query = {"$and": [query, after]} if query else after
+    return collection.find(query, projection).sort([(sort_field, -1), ("id", -1)])
+
+async def fetch_page(collection, query: dict, sort_field: str, limit: int,
+                     cursor: Optional[str], projection: Optional[dict] = None) -> tuple:
+    """Загрузить одну страницу; вернуть документы и курсор следующей страницы (или None)"""
+    docs = await keyset_find(collection, query, sort_field, cursor, projection).to_list(limit + 1)
+    if len(docs) > limit:
+        docs = docs[:limit]
+        return docs, encode_cursor(docs[-1], sort_field)
+    return docs, None
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]):
+    """Передать курсор следующей страницы в заголовке X-Next-Cursor"""
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
+def stream_ndjson(motor_cursor, to_dict) -> StreamingResponse:
+    """Отдавать документы построчно (NDJSON) по мере чтения из курсора Motor"""
+    async def generate():
+        async for doc in motor_cursor:
+            yield orjson.dumps(to_dict(doc)) + b"\n"
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+# Кэш чтения (read-through) для возражений и цитат и условные GET-запросы
+CACHE_TTL = float(os.environ.get("CACHE_TTL", "30"))
+CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", "1024"))
+CACHE_MAX_BYTES = int(os.environ.get("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_CHANGE_STREAMS = os.environ.get("CACHE_CHANGE_STREAMS", "0") == "1"
+
+class ReadCache:
+    """LRU-кэш с TTL и ограничением по объему, разделенный по коллекциям.
+
+    Хранит уже сериализованные тела ответов вместе с их ETag. Ключи внутри
+    коллекции имеют вид ("item", id) для отдельного документа и
+    ("list", ...параметры запроса) для списков. Запись в документ сбрасывает
+    его ("item", id) и все списки коллекции.
+
+    Каждый сброс увеличивает поколение коллекции. Заполняющий кэш запрос
+    запоминает поколение до обращения к MongoDB, и put() пропускает ответ,
+    если за время запроса коллекция была изменена: иначе чтение, начатое до
+    записи, закэшировало бы старое тело на весь TTL.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.generations = collections.Counter()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "stale_fills": 0}
+
+    def get(self, namespace: str, key: tuple):
+        entry = self.entries.get((namespace, key))
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._remove((namespace, key))
+            self.stats["misses"] += 1
+            return None
+        self.entries.move_to_end((namespace, key))
+        self.stats["hits"] += 1
+        return entry[2]
+
+    def generation(self, namespace: str) -> int:
+        return self.generations[namespace]
+
+    def put(self, namespace: str, key: tuple, value, size: int, generation: int):
+        if generation != self.generations[namespace]:
+            self.stats["stale_fills"] += 1
+            return
+        if size > self.max_bytes:
+            return
+        if (namespace, key) in self.entries:
+            self._remove((namespace, key))
+        self.entries[(namespace, key)] = (time.monotonic() + self.ttl, size, value)
+        self.total_bytes += size
+        while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+            self._remove(next(iter(self.entries)))
+            self.stats["evictions"] += 1
+
+    def invalidate(self, namespace: str, item_id: Optional[str] = None):
+        """Сбросить списки коллекции и документ item_id (или всю коллекцию, если id не задан)"""
+        self.generations[namespace] += 1
+        stale = [
+            full_key for full_key in self.entries
+            if full_key[0] == namespace
+            and (item_id is None or full_key[1][0] != "item" or full_key[1][1] == item_id)
+        ]
+        for full_key in stale:
+            self._remove(full_key)
+        self.stats["invalidations"] += len(stale)
+
+    def _remove(self, full_key: tuple):
+        _, size, _ = self.entries.pop(full_key)
+        self.total_bytes -= size
+
+read_cache = ReadCache(CACHE_TTL, CACHE_MAX_ENTRIES, CACHE_MAX_BYTES)
+
+def serialize_models(models) -> tuple:
+    """Сериализовать модель или список моделей в JSON (orjson) и вычислить ETag по содержимому"""
+    if isinstance(models, list):
+        body = orjson.dumps([model.dict() for model in models])
+    else:
+        body = orjson.dumps(models.dict())
+    return body, body_etag(body)
+
+def body_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+def cached_json_response(request: Request, body: bytes, etag: str,
+                         next_cursor: Optional[str] = None) -> Response:
+    """Отдать готовое тело ответа или 304, если у клиента актуальная версия"""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if next_cursor:
+        headers[NEXT_CURSOR_HEADER] = next_cursor
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def cached_json_responses(model, description: str, ndjson: bool = False) -> dict:
+    """Описание ответов для OpenAPI у маршрутов, отдающих готовое тело (Response), а не модель"""
+    ok = {"model": model, "description": description}
+    if ndjson:
+        ok["content"] = {"application/x-ndjson": {}}
+    return {200: ok, 304: {"description": "Содержимое не изменилось (совпал If-None-Match)"}}
+
+CHANGE_STREAM_RETRY_MIN_DELAY = 1.0
+CHANGE_STREAM_RETRY_MAX_DELAY = 30.0
+# История oplog для resume token утеряна — продолжить с места обрыва нельзя
+CHANGE_STREAM_HISTORY_LOST_CODES = {280, 286}
+
+async def watch_collection_changes():
+    """Сбрасывать кэш и обновлять автодополнение по change stream, чтобы видеть записи других воркеров.
+
+    При обрыве (смена primary, сеть) поток перезапускается с последнего
+    resume token. Если продолжить нельзя, кэш сбрасывается целиком, а индекс
+    автодополнения перестраивается: пропущенные изменения иначе не увидеть.
+    """
+    pipeline = [{"$match": {"ns.coll": {"$in": ["objections", "quotes"]}}}]
+    resume_token = None
+    resync = False
+    delay = CHANGE_STREAM_RETRY_MIN_DELAY
+    while True:
+        try:
+            async with db.watch(pipeline, full_document="updateLookup", resume_after=resume_token) as change_stream:
+                if resync:
+                    read_cache.invalidate("objections")
+                    read_cache.invalidate("quotes")
+                    await rebuild_autocomplete_index()
+                    resync = False
+                delay = CHANGE_STREAM_RETRY_MIN_DELAY
+                async for change in change_stream:
+                    read_cache.invalidate(change["ns"]["coll"])
+                    if change["ns"]["coll"] == "objections":
+                        if change.get("fullDocument"):
+                            autocomplete_index.upsert(change["fullDocument"])
+                        elif change["operationType"] == "delete":
+                            autocomplete_index.remove_by_object_id(change["documentKey"]["_id"])
+                    resume_token = change_stream.resume_token
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if isinstance(e, OperationFailure) and e.code in CHANGE_STREAM_HISTORY_LOST_CODES:
+                resume_token = None
+            resync = resync or resume_token is None
+            logger.exception("Change stream for cache invalidation failed, restarting in %.0f s", delay)
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, CHANGE_STREAM_RETRY_MAX_DELAY)
+
+# Автодополнение: префиксный и нечеткий (с опечатками) поиск по заголовкам и тегам.
+# Индекс целиком в памяти воркера: отсортированный словарь термов для префиксов
+# (bisect) и триграммы термов для кандидатов с опечатками; обновляется на записях.
+AUTOCOMPLETE_FIELDS = {
+    "_id": True, "id": True, "title": True, "tags": True, "category": True, "is_favorite": True, "usage_count": True,
+}
+AUTOCOMPLETE_TOKEN_RE = re.compile(r"\w+")
+# Нечеткий поиск нужен, только если точных и префиксных совпадений мало
+AUTOCOMPLETE_FUZZY_AFTER = 50
+AUTOCOMPLETE_FUZZY_CANDIDATES = 100
+AUTOCOMPLETE_MAX_COMPLETIONS = 200
+AUTOCOMPLETE_SCAN_THRESHOLD = 1000
+AUTOCOMPLETE_RANK_REFRESH = 60.0
+# Без change stream индекс догоняет записи других воркеров опросом по updated_at,
+# а удаления находит сверкой множества id. Окно опроса с запасом перекрывает
+# интервал, потому что updated_at выставляют часы разных воркеров.
+AUTOCOMPLETE_SYNC_INTERVAL = float(os.environ.get("AUTOCOMPLETE_SYNC_INTERVAL", "5"))
+AUTOCOMPLETE_SYNC_OVERLAP = 60.0
+AUTOCOMPLETE_RECONCILE_INTERVAL = float(os.environ.get("AUTOCOMPLETE_RECONCILE_INTERVAL", "60"))
+
+def autocomplete_tokens(text: str) -> list:
+    return AUTOCOMPLETE_TOKEN_RE.findall(text.lower().replace("ё", "е"))
+
+def term_trigrams(term: str) -> set:
+    # Дополнение только слева: триграммы начала слова совпадают у префикса и терма
+    padded = "  " + term
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def edit_distance_row(a: str, b: str, max_distance: int) -> Optional[list]:
+    """Последняя строка матрицы Левенштейна a против b (row[j] — расстояние до b[:j]).
+
+    None, если расстояние до любого префикса b заведомо больше max_distance.
+    """
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, char_b in enumerate(b, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b))
+        if min(current) > max_distance:
+            return None
+        previous = current
+    return previous
+
+class AutocompleteIndex:
+    """Подсказки по заголовкам и тегам возражений.
+
+    Последнее слово запроса сопоставляется как префикс, предыдущие — как целые
+    слова; слова от 4 букв допускают опечатку (от 8 букв — две). Кандидаты с
+    опечатками отбираются по общим триграммам, а не перебором словаря.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        # Ключ сортировки внутри одного веса: популярные выше, затем по алфавиту
+        self.rank_keys = {}
+        # Все id в порядке rank_keys, перестраивается не чаще AUTOCOMPLETE_RANK_REFRESH секунд;
+        # новые id дописываются в конец до следующей перестройки
+        self.popular = []
+        self.popular_members = set()
+        self.popular_built_at = 0.0
+        self.object_ids = {}
+        self.term_postings = {}
+        self.sorted_terms = []
+        self.trigram_terms = {}
+
+    def build(self, docs: list):
+        self.__init__()
+        for doc in docs:
+            self.upsert(doc)
+        self.popular_order()
+
+    def upsert(self, doc: dict):
+        self.remove(doc["id"])
+        terms = set(autocomplete_tokens(doc.get("title", "")))
+        for tag in doc.get("tags") or []:
+            terms.update(autocomplete_tokens(tag))
+        self.entries[doc["id"]] = {
+            "title": doc.get("title", ""),
+            "category": doc.get("category"),
+            "usage_count": doc.get("usage_count", 0),
+            "is_favorite": doc.get("is_favorite", False),
+            "terms": terms,
+            "object_id": doc.get("_id"),
+        }
+        self.rank_keys[doc["id"]] = (-doc.get("usage_count", 0), doc.get("title", ""))
+        if doc["id"] not in self.popular_members:
+            self.popular.append(doc["id"])
+            self.popular_members.add(doc["id"])
+        if doc.get("_id") is not None:
+            self.object_ids[doc["_id"]] = doc["id"]
+        for term in terms:
+            postings = self.term_postings.get(term)
+            if postings is None:
+                postings = self.term_postings[term] = set()
+                bisect.insort(self.sorted_terms, term)
+                for trigram in term_trigrams(term):
+                    self.trigram_terms.setdefault(trigram, set()).add(term)
+            postings.add(doc["id"])
+
+    def remove(self, objection_id: str):
+        entry = self.entries.pop(objection_id, None)
+        if entry is None:
+            return
+        del self.rank_keys[objection_id]
+        self.object_ids.pop(entry["object_id"], None)
+        for term in entry["terms"]:
+            postings = self.term_postings[term]
+            postings.discard(objection_id)
+            if not postings:
+                del self.term_postings[term]
+                del self.sorted_terms[bisect.bisect_left(self.sorted_terms, term)]
+                for trigram in term_trigrams(term):
+                    self.trigram_terms[trigram].discard(term)
+                    if not self.trigram_terms[trigram]:
+                        del self.trigram_terms[trigram]
+
+    def remove_by_object_id(self, object_id):
+        objection_id = self.object_ids.get(object_id)
+        if objection_id is not None:
+            self.remove(objection_id)
+
+    def add_usage(self, objection_id: str, count: int):
+        entry = self.entries.get(objection_id)
+        if entry is not None:
+            entry["usage_count"] += count
+            self.rank_keys[objection_id] = (-entry["usage_count"], entry["title"])
+
+    def popular_order(self) -> list:
+        if time.monotonic() - self.popular_built_at > AUTOCOMPLETE_RANK_REFRESH:
+            self.popular = sorted(self.entries, key=self.rank_keys.__getitem__)
+            self.popular_members = set(self.popular)
+            self.popular_built_at = time.monotonic()
+        return self.popular
+
+    def top_ids(self, ids: set, count: int) -> list:
+        """count лучших id из множества по rank_keys"""
+        if len(ids) <= AUTOCOMPLETE_SCAN_THRESHOLD:
+            return heapq.nsmallest(count, ids, key=self.rank_keys.__getitem__)
+        # Большое множество: проходим готовый порядок популярности, пока не наберем count
+        return list(itertools.islice(
+            (objection_id for objection_id in self.popular_order() if objection_id in ids), count
+        ))
+
+    def match_terms(self, token: str, as_prefix: bool) -> dict:
+        """Термы, подходящие к слову запроса, с весом: точное 3, префикс 2, с опечатками меньше 1"""
+        matches = {}
+        if token in self.term_postings:
+            matches[token] = 3.0
+        if as_prefix:
+            start = bisect.bisect_left(self.sorted_terms, token)
+            completions = []
+            for term in itertools.islice(self.sorted_terms, start, None):
+                if not term.startswith(token):
+                    break
+                completions.append(term)
+            # Для коротких префиксов берем самые частые продолжения
+            if len(completions) > AUTOCOMPLETE_MAX_COMPLETIONS:
+                completions = heapq.nlargest(
+                    AUTOCOMPLETE_MAX_COMPLETIONS, completions, key=lambda term: len(self.term_postings[term])
+                )
+            for term in completions:
+                matches.setdefault(term, 2.0)
+        max_distance = 2 if len(token) >= 8 else 1 if len(token) >= 4 else 0
+        if not max_distance or len(matches) >= AUTOCOMPLETE_FUZZY_AFTER:
+            return matches
+        # Опечатка затрагивает не более трех триграмм; расстояние считаем только
+        # для термов с наибольшим числом общих триграмм
+        query_trigrams = term_trigrams(token)
+        shared = collections.Counter()
+        for trigram in query_trigrams:
+            shared.update(self.trigram_terms.get(trigram, ()))
+        min_shared = max(1, len(query_trigrams) - 3 * max_distance)
+        for term, count in shared.most_common(AUTOCOMPLETE_FUZZY_CANDIDATES + len(matches)):
+            if count < min_shared:
+                break
+            if term in matches or len(term) < len(token) - max_distance:
+                continue
+            if not as_prefix and len(term) > len(token) + max_distance:
+                continue
+            row = edit_distance_row(token, term[:len(token) + max_distance], max_distance)
+            if row is None:
+                continue
+            if as_prefix:
+                distance = min(row[max(1, len(token) - max_distance):])
+            else:
+                distance = row[-1]
+            if distance <= max_distance:
+                matches[term] = 1.0 / (1 + distance)
+        return matches
+
+    def set_favorite(self, objection_id: str, is_favorite: bool):
+        entry = self.entries.get(objection_id)
+        if entry is not None:
+            entry["is_favorite"] = is_favorite
+
+    def prefix_ids(self, query: str, category: Optional[str] = None, favorites_only: bool = False) -> set:
+        """id возражений, у которых последнее слово запроса — префикс слова заголовка
+        или тега, а остальные слова встречаются целиком; с фильтрами списка
+        """
+        tokens = autocomplete_tokens(query)
+        if not tokens:
+            return set()
+        start = bisect.bisect_left(self.sorted_terms, tokens[-1])
+        ids = set()
+        for term in itertools.islice(self.sorted_terms, start, None):
+            if not term.startswith(tokens[-1]):
+                break
+            ids |= self.term_postings[term]
+        for token in tokens[:-1]:
+            ids &= self.term_postings.get(token, set())
+        if category or favorites_only:
+            ids = {
+                objection_id for objection_id in ids
+                if (not category or self.entries[objection_id]["category"] == category)
+                and (not favorites_only or self.entries[objection_id]["is_favorite"])
+            }
+        return ids
+
+    def suggest(self, query: str, limit: int) -> list:
+        tokens = autocomplete_tokens(query)
+        if not tokens:
+            return []
+        # Уровни веса: суммарный вес совпадений -> множество id. Все операции
+        # над множествами выполняются целиком, без цикла по каждому id в Python.
+        tiers = None
+        for position, token in enumerate(tokens):
+            matches = self.match_terms(token, as_prefix=position == len(tokens) - 1)
+            token_tiers, seen = {}, set()
+            # Термы по убыванию веса: возражение попадает в уровень лучшего совпадения
+            for term, weight in sorted(matches.items(), key=lambda item: -item[1]):
+                new_ids = self.term_postings[term] - seen
+                if new_ids:
+                    token_tiers.setdefault(weight, set()).update(new_ids)
+                    seen |= new_ids
+            if tiers is None:
+                tiers = token_tiers
+            else:
+                # Каждое слово запроса должно найтись в подсказке
+                combined = {}
+                for score, ids in tiers.items():
+                    for weight, token_ids in token_tiers.items():
+                        common = ids & token_ids
+                        if common:
+                            combined.setdefault(score + weight, set()).update(common)
+                tiers = combined
+            if not tiers:
+                return []
+        ranked = []
+        for score in sorted(tiers, reverse=True):
+            best = self.top_ids(tiers[score], limit - len(ranked))
+            ranked.extend((objection_id, score) for objection_id in best)
+            if len(ranked) >= limit:
+                break
+        return [
+            {
+                "id": objection_id,
+                "title": self.entries[objection_id]["title"],
+                "category": self.entries[objection_id]["category"],
+                "score": round(score, 3),
+            }
+            for objection_id, score in ranked
+        ]
+
+autocomplete_index = AutocompleteIndex()
+
+async def rebuild_autocomplete_index():
+    started = time.perf_counter()
+    docs = await db.objections.find({}, AUTOCOMPLETE_FIELDS).to_list(None)
+    autocomplete_index.build(docs)
+    logger.info(
+        "Autocomplete index built for %d objections (%d terms) in %.1f ms",
+        len(docs), len(autocomplete_index.term_postings), (time.perf_counter() - started) * 1000
+    )
+
+async def sync_autocomplete_index(since: datetime) -> int:
+    """Обновить в индексе возражения, измененные начиная с since"""
+    synced = 0
+    async for doc in db.objections.find({"updated_at": {"$gte": since}}, AUTOCOMPLETE_FIELDS):
+        autocomplete_index.upsert(doc)
+        synced += 1
+    return synced
+
+async def reconcile_autocomplete_deletes() -> int:
+    """Убрать из индекса возражения, которых больше нет в коллекции"""
+    # Добавленные во время чтения id не трогаем: их могло не быть в выборке
+    known = set(autocomplete_index.entries)
+    existing = {doc["id"] async for doc in db.objections.find({}, {"_id": False, "id": True})}
+    removed = known - existing
+    for objection_id in removed:
+        autocomplete_index.remove(objection_id)
+    return len(removed)
+
+async def run_autocomplete_sync():
+    reconciled_at = time.monotonic()
+    while True:
+        since = datetime.utcnow() - timedelta(seconds=AUTOCOMPLETE_SYNC_OVERLAP)
+        await asyncio.sleep(AUTOCOMPLETE_SYNC_INTERVAL)
+        try:
+            await sync_autocomplete_index(since)
+            if time.monotonic() - reconciled_at >= AUTOCOMPLETE_RECONCILE_INTERVAL:
+                reconciled_at = time.monotonic()
+                await reconcile_autocomplete_deletes()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Autocomplete index sync failed")
+
+# Отложенная пакетная запись счетчиков использования (write-behind)
+USAGE_FLUSH_INTERVAL = float(os.environ.get("USAGE_FLUSH_INTERVAL", "1.0"))
+USAGE_MAX_STALENESS = float(os.environ.get("USAGE_MAX_STALENESS", "5.0"))
+# Ошибки записи, после которых инкремент имеет смысл повторить при следующем сбросе
+# (конфликт записи, смена primary, остановка узла, таймаут); прочие — постоянные
+RETRYABLE_WRITE_ERROR_CODES = {50, 91, 112, 189, 10107, 11600, 11602, 13435, 13436}
+
+class UsageCounterBuffer:
+    """Накапливает инкременты usage_count в памяти и сбрасывает их одним bulk_write.
+
+    Сброс выполняется фоновой задачей каждые flush_interval секунд, досрочно,
+    если самый старый несохраненный инкремент старше max_staleness, и при
+    остановке приложения.
+    """
+
+    def __init__(self, collection_name: str, flush_interval: float, max_staleness: float):
+        self.collection_name = collection_name
+        self.flush_interval = flush_interval
+        self.max_staleness = max_staleness
+        self.pending = {}
+        # Те же инкременты с разбивкой по часам для аналитики: (id, начало часа) -> число
+        self.pending_hours = {}
+        self.oldest_pending_at = None
+        self.lock = asyncio.Lock()
+        self.task = None
+        # Досрочные сбросы из add(): ссылки не дают задачам пропасть до завершения
+        self.flush_tasks = set()
+        self.stats = {
+            "increments_received": 0,
+            "increments_flushed": 0,
+            "writes_issued": 0,
+            "flushes": 0,
+            "flush_errors": 0,
+            "increments_dropped": 0,
+            "last_flush_ms": 0.0,
+        }
+
+    def add(self, objection_id: str):
+        now = datetime.utcnow()
+        count, _ = self.pending.get(objection_id, (0, now))
+        self.pending[objection_id] = (count + 1, now)
+        hour_key = (objection_id, now.replace(minute=0, second=0, microsecond=0))
+        self.pending_hours[hour_key] = self.pending_hours.get(hour_key, 0) + 1
+        self.stats["increments_received"] += 1
+        if self.oldest_pending_at is None:
+            self.oldest_pending_at = time.monotonic()
+        elif time.monotonic() - self.oldest_pending_at >= self.max_staleness and not self.lock.locked():
+            task = asyncio.get_running_loop().create_task(self.flush())
+            self.flush_tasks.add(task)
+            task.add_done_callback(self.flush_tasks.discard)
+
+    async def flush(self):
+        async with self.lock:
+            if not self.pending:
+                return
+            batch, self.pending, self.oldest_pending_at = self.pending, {}, None
+            hour_batch, self.pending_hours = self.pending_hours, {}
+            operations = [
+                UpdateOne(
+                    {"id": objection_id},
+                    # $max: сброс не должен откатывать updated_at, выставленный более поздней записью
+                    {"$inc": {"usage_count": count}, "$max": {"updated_at": last_used_at}}
+                )
+                for objection_id, (count, last_used_at) in batch.items()
+            ]
+            objection_ids = list(batch)
+            failed = set()
+            started = time.perf_counter()
+            try:
+                await db[self.collection_name].bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                # Остальные операции неупорядоченного пакета уже применены: в буфер
+                # возвращаются только неудавшиеся и только при временной ошибке
+                self.stats["flush_errors"] += 1
+                retry = set()
+                for write_error in e.details["writeErrors"]:
+                    objection_id = objection_ids[write_error["index"]]
+                    failed.add(objection_id)
+                    if write_error["code"] in RETRYABLE_WRITE_ERROR_CODES:
+                        retry.add(objection_id)
+                    else:
+                        self.stats["increments_dropped"] += batch[objection_id][0]
+                        logger.error(
+                            "Usage counter for objection %s dropped (%d increments): %s",
+                            objection_id, batch[objection_id][0], write_error["errmsg"]
+                        )
+                self.requeue(
+                    {objection_id: batch[objection_id] for objection_id in retry},
+                    {hour_key: count for hour_key, count in hour_batch.items() if hour_key[0] in retry}
+                )
+                if retry:
+                    logger.warning("Usage counter flush partially failed, %d objections re-queued", len(retry))
+            except ConnectionFailure:
+                # Сервер недоступен: возвращаем весь пакет до следующего сброса
+                self.stats["flush_errors"] += 1
+                self.requeue(batch, hour_batch)
+                logger.exception("Usage counter flush failed, %d objections re-queued", len(batch))
+                return
+            except Exception:
+                # Часть пакета могла записаться, и повтор задвоил бы ее инкременты
+                self.stats["flush_errors"] += 1
+                self.stats["increments_dropped"] += sum(count for count, _ in batch.values())
+                logger.exception("Usage counter flush failed, %d objections dropped", len(batch))
+                return
+            for objection_id, (count, _) in batch.items():
+                if objection_id not in failed:
+                    read_cache.invalidate(self.collection_name, objection_id)
+                    autocomplete_index.add_usage(objection_id, count)
+            hour_batch = {hour_key: count for hour_key, count in hour_batch.items() if hour_key[0] not in failed}
+            try:
+                await record_usage_rollups(hour_batch)
+            except Exception:
+                # Счетчики уже записаны: повтор привел бы к двойному учету в usage_count
+                self.stats["flush_errors"] += 1
+                logger.exception("Usage rollup write failed, %d buckets dropped", len(hour_batch))
+            self.stats["flushes"] += 1
+            self.stats["writes_issued"] += len(operations)
+            self.stats["increments_flushed"] += sum(
+                count for objection_id, (count, _) in batch.items() if objection_id not in failed
+            )
+            self.stats["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 3)
+
+    def requeue(self, batch: dict, hour_batch: dict):
+        """Вернуть несохраненные инкременты в буфер до следующего сброса"""
+        for objection_id, (count, last_used_at) in batch.items():
+            pending_count, _ = self.pending.get(objection_id, (0, last_used_at))
+            self.pending[objection_id] = (pending_count + count, last_used_at)
+        for hour_key, count in hour_batch.items():
+            self.pending_hours[hour_key] = self.pending_hours.get(hour_key, 0) + count
+        if batch and self.oldest_pending_at is None:
+            self.oldest_pending_at = time.monotonic()
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            # Отменяем фоновую задачу только между сбросами: отмена посреди
+            # bulk_write потеряла бы уже вынутый из буфера пакет
+            async with self.lock:
+                self.task.cancel()
+            self.task = None
+        if self.flush_tasks:
+            await asyncio.gather(*self.flush_tasks)
+        await self.flush()
+
+    def metrics(self) -> dict:
+        return {
+            **self.stats,
+            "writes_coalesced": self.stats["increments_flushed"] - self.stats["writes_issued"],
+            "pending_objections": len(self.pending),
+            "pending_increments": sum(count for count, _ in self.pending.values()),
+            "flush_interval": self.flush_interval,
+            "max_staleness": self.max_staleness,
+        }
+
+usage_counters = UsageCounterBuffer("objections", USAGE_FLUSH_INTERVAL, USAGE_MAX_STALENESS)
+
+# Аналитика использования: предагрегированные бакеты по часам и дням.
+# Документ usage_rollups: {dimension: "objection"|"category", key, granularity:
+# "hour"|"day", bucket, count}. Запросы дашбордов читают O(бакетов), а не O(событий).
+ANALYTICS_MAX_DAYS = 365
+ANALYTICS_HOURLY_RETENTION_DAYS = int(os.environ.get("ANALYTICS_HOURLY_RETENTION_DAYS", "14"))
+
+async def record_usage_rollups(hour_counts: dict):
+    """Добавить инкременты (id, начало часа) -> число в часовые и дневные бакеты"""
+    if not hour_counts:
+        return
+    objection_ids = list({objection_id for objection_id, _ in hour_counts})
+    categories = {
+        doc["id"]: doc.get("category")
+        async for doc in db.objections.find(
+            {"id": {"$in": objection_ids}}, {"_id": False, "id": True, "category": True}
+        )
+    }
+    totals = {}
+    for (objection_id, hour), count in hour_counts.items():
+        category = categories.get(objection_id)
+        for granularity, bucket in (("hour", hour), ("day", hour.replace(hour=0))):
+            for dimension, key in (("objection", objection_id), ("category", category)):
+                bucket_key = (dimension, key, granularity, bucket)
+                totals[bucket_key] = totals.get(bucket_key, 0) + count
+
+    operations = []
+    for (dimension, key, granularity, bucket), count in totals.items():
+        update = {"$inc": {"count": count}}
+        if dimension == "objection":
+            update["$set"] = {"category": categories.get(key)}
+        if granularity == "hour":
+            update["$setOnInsert"] = {
+                "expires_at": bucket + timedelta(days=ANALYTICS_HOURLY_RETENTION_DAYS)
+            }
+        operations.append(UpdateOne(
+            {"dimension": dimension, "key": key, "granularity": granularity, "bucket": bucket},
+            update, upsert=True
+        ))
+    await db.usage_rollups.bulk_write(operations, ordered=False)
+
+def analytics_since(granularity: str, days: int) -> datetime:
+    """Начало первого бакета окна из days последних суток (включая текущие)"""
+    now = datetime.utcnow()
+    if granularity == "hour":
+        return now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=days * 24 - 1)
+    return now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days - 1)
+
+async def sum_rollups(match: dict, group_key: str, limit: Optional[int] = None) -> list:
+    pipeline = [
+        {"$match": match},
+        {"$group": {"_id": f"${group_key}", "count": {"$sum": "$count"}}},
+        {"$sort": {"count": -1} if limit else {"_id": 1}},
+    ]
+    if limit:
+        pipeline.append({"$limit": limit})
+    return await read_db.usage_rollups.aggregate(pipeline).to_list(None)
+
+# Массовый импорт и экспорт (NDJSON / CSV)
+IMPORT_CHUNK_SIZE = int(os.environ.get("IMPORT_CHUNK_SIZE", "500"))
+IMPORT_MAX_REPORTED_ERRORS = 1000
+# Списки (responses, tags) в ячейке CSV записываются JSON-массивом, чтобы
+# элементы могли содержать любые символы. При импорте ячейка, не являющаяся
+# JSON-массивом строк, делится по CSV_LIST_SEPARATOR (файлы, набранные вручную).
+CSV_LIST_SEPARATOR = "|"
+
+OBJECTION_EXPORT_FIELDS = ["id", "title", "responses", "category", "tags"]
+QUOTE_EXPORT_FIELDS = ["id", "text", "author", "category"]
+
+async def iter_body_lines(request: Request):
+    """Построчно читать тело запроса по мере поступления, не загружая его целиком"""
+    # Инкрементальный декодер не ломает многобайтовые символы на границе чанков
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in request.stream():
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+async def iter_ndjson_rows(request: Request):
+    """Строки NDJSON в виде (номер строки, dict или текст ошибки разбора)"""
+    row_number = 0
+    async for line in iter_body_lines(request):
+        row_number += 1
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield row_number, f"Некорректный JSON: {e}"
+            continue
+        yield row_number, row if isinstance(row, dict) else "Ожидается JSON-объект"
+
+async def iter_csv_rows(request: Request, list_fields: tuple):
+    """Строки CSV с заголовком в виде (номер записи, dict); списки разбираются csv_list_cell"""
+    header = None
+    row_number = 0
+    record = ""
+    async for line in iter_body_lines(request):
+        # Поле в кавычках может содержать перевод строки: копим до четного числа кавычек
+        record = record + "\n" + line if record else line
+        if record.count('"') % 2:
+            continue
+        values, record = next(csv.reader([record]), []), ""
+        if not values:
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        row_number += 1
+        row = {name: value for name, value in zip(header, values) if value != ""}
+        for field in list_fields:
+            if field in row:
+                row[field] = csv_list_cell(row[field])
+        yield row_number, row
+
+def csv_list_cell(value: str) -> list:
+    if value.startswith("["):
+        try:
+            items = json.loads(value)
+        except ValueError:
+            items = None
+        if isinstance(items, list) and all(isinstance(item, str) for item in items):
+            return items
+    return [item.strip() for item in value.split(CSV_LIST_SEPARATOR) if item.strip()]
+
+def upsert_operation(row: BaseModel, key_field: str, fields: dict, on_insert: dict) -> UpdateOne:
+    """Upsert по id, а без него — по key_field.
+
+    В fields передаются только поля, заданные в строке импорта; значения по
+    умолчанию для остальных полей модели записываются лишь при вставке.
+    """
+    defaults = {k: v for k, v in row.dict().items() if k != "id" and k not in fields}
+    update = {"$set": fields, "$setOnInsert": {**defaults, **on_insert}}
+    if row.id:
+        return UpdateOne({"id": row.id}, update, upsert=True)
+    update["$setOnInsert"]["id"] = str(uuid.uuid4())
+    return UpdateOne({key_field: fields[key_field]}, update, upsert=True)
+
+async def stored_objection_responses(rows: list) -> dict:
+    """Сохраненные ответы возражений пачки импорта по ключу upsert: ("id", id) или ("title", заголовок)"""
+    query = {"$or": [
+        {"id": {"$in": [row.id for row in rows if row.id]}},
+        {"title": {"$in": [row.title for row in rows if not row.id]}},
+    ]}
+    stored = {}
+    async for doc in db.objections.find(query, {"_id": False, "id": True, "title": True, "responses": True}):
+        stored[("id", doc["id"])] = doc.get("responses", [])
+        stored.setdefault(("title", doc["title"]), doc.get("responses", []))
+    return stored
+
+async def index_written_objections(upserted_ids: list, rows: list):
+    """Обновить в индексе автодополнения возражения из записанной пачки импорта"""
+    query = {"$or": [
+        {"_id": {"$in": upserted_ids}},
+        {"id": {"$in": [row.id for row in rows if row.id]}},
+        {"title": {"$in": [row.title for row in rows if not row.id]}},
+    ]}
+    async for doc in db.objections.find(query, AUTOCOMPLETE_FIELDS):
+        autocomplete_index.upsert(doc)
+
+def objection_upsert(row: ObjectionImport, now: datetime, stored: dict) -> UpdateOne:
+    fields = row.dict(exclude_unset=True, exclude={"id"})
+    # Как и при PUT, ответы с неизменившимся текстом сохраняют id и created_at
+    key = ("id", row.id) if row.id else ("title", row.title)
+    fields["responses"] = merge_responses(stored.get(key, []), row.responses)
+    fields["updated_at"] = now
+    on_insert = {"is_favorite": False, "usage_count": 0, "created_at": now}
+    return upsert_operation(row, "title", fields, on_insert)
+
+def quote_upsert(row: QuoteImport, now: datetime, stored: dict) -> UpdateOne:
+    fields = row.dict(exclude_unset=True, exclude={"id"})
+    return upsert_operation(row, "text", fields, {"created_at": now})
+
+async def import_rows(collection_name: str, rows, model, build_upsert, load_stored=None, on_written=None) -> dict:
+    """Проверить и записать строки пачками; ошибки отдельных строк не прерывают импорт.
+
+    load_stored(строки пачки) загружает одним запросом то, что build_upsert
+    должен объединить с уже сохраненными документами. on_written(_id
+    вставленных документов, записанные без ошибок строки) вызывается после
+    каждой пачки.
+    """
+    summary = {"processed": 0, "inserted": 0, "updated": 0, "error_count": 0, "errors": []}
+
+    def report(row_number: int, error: str):
+        summary["error_count"] += 1
+        if len(summary["errors"]) < IMPORT_MAX_REPORTED_ERRORS:
+            summary["errors"].append({"row": row_number, "error": error})
+
+    async def write_chunk(chunk: list, row_numbers: list):
+        stored = await load_stored(chunk) if load_stored else {}
+        now = datetime.utcnow()
+        operations = [build_upsert(row, now, stored) for row in chunk]
+        try:
+            result = await db[collection_name].bulk_write(operations, ordered=False)
+            details = result.bulk_api_result
+        except BulkWriteError as e:
+            details = e.details
+            for write_error in details["writeErrors"]:
+                report(row_numbers[write_error["index"]], write_error["errmsg"])
+        summary["inserted"] += details["nUpserted"]
+        summary["updated"] += details["nMatched"]
+        if on_written:
+            failed = {write_error["index"] for write_error in details.get("writeErrors", [])}
+            await on_written(
+                [upserted["_id"] for upserted in details.get("upserted", [])],
+                [row for index, row in enumerate(chunk) if index not in failed],
+            )
+
+    chunk, row_numbers = [], []
+    async for row_number, row in rows:
+        summary["processed"] += 1
+        if isinstance(row, str):
+            report(row_number, row)
+            continue
+        try:
+            chunk.append(model(**row))
+        except ValidationError as e:
+            report(row_number, "; ".join(
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+            ))
+            continue
+        row_numbers.append(row_number)
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            await write_chunk(chunk, row_numbers)
+            chunk, row_numbers = [], []
+    if chunk:
+        await write_chunk(chunk, row_numbers)
+
+    read_cache.invalidate(collection_name)
+    return summary
+
+def import_rows_source(request: Request, format: str, list_fields: tuple):
+    if format == "ndjson":
+        return iter_ndjson_rows(request)
+    if format == "csv":
+        return iter_csv_rows(request, list_fields)
+    raise HTTPException(status_code=400, detail="Поддерживаются форматы ndjson и csv")
+
+def export_response(collection_name: str, fields: list, format: str, filename: str) -> StreamingResponse:
+    """Потоковая выгрузка коллекции в формате импорта"""
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="Поддерживаются форматы ndjson и csv")
+    projection = {field: True for field in fields}
+    projection["_id"] = False
+    motor_cursor = read_db[collection_name].find({}, projection).sort("id", 1)
+
+    async def generate():
+        if format == "csv":
+            yield csv_line(fields)
+        async for doc in motor_cursor:
+            if "responses" in doc:
+                doc["responses"] = [response["text"] for response in doc["responses"]]
+            if format == "ndjson":
+                yield orjson.dumps({field: doc.get(field) for field in fields}) + b"\n"
+            else:
+                yield csv_line([
+                    json.dumps(value, ensure_ascii=False) if isinstance(value, list) else (value or "")
+                    for value in (doc.get(field) for field in fields)
+                ])
+
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv; charset=utf-8"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}.{format}"'}
+    return StreamingResponse(generate(), media_type=media_type, headers=headers)
+
+def csv_line(values: list) -> bytes:
+    output = io.StringIO()
+    csv.writer(output, lineterminator="\n").writerow(values)
+    return output.getvalue().encode()
+
 # Add your routes to the router instead of directly to app
 @api_router.get("/")
 async def root():
@@ -91,18 +1366,33 @@ async def create_status_check(input: StatusCheckCreate):
     return status_obj
 
 @api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
-    status_checks = await db.status_checks.find().to_list(1000)
+async def get_status_checks(
+    response: Response,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False
+):
+    if stream:
+        return stream_ndjson(
+            keyset_find(read_db.status_checks, {}, "timestamp", cursor), lambda doc: StatusCheck(**doc).dict()
+        )
+    status_checks, next_cursor = await fetch_page(read_db.status_checks, {}, "timestamp", limit, cursor)
+    set_next_cursor(response, next_cursor)
     return [StatusCheck(**status_check) for status_check in status_checks]
 
 # Objections endpoints
-@api_router.get("/objections", response_model=List[Objection])
-async def get_objections(
-    category: Optional[str] = None,
-    search: Optional[str] = None,
-    favorites_only: bool = False
-):
-    """Получить список возражений с возможностью фильтрации"""
+# Не больше стольких возражений (самых популярных) отдает поиск по недонабранному слову
+SEARCH_PREFIX_MAX_IDS = 1000
+
+async def objection_filter(category: Optional[str], search: Optional[str], favorites_only: bool) -> dict:
+    """Фильтр списка возражений.
+
+    Поиск идет по полнотекстовому индексу, который находит только целые слова
+    (с учетом морфологии, в том числе в текстах ответов). Если он ничего не
+    находит — например, последнее слово набрано не полностью при поиске на
+    каждое нажатие клавиши, — возражения подбираются по префиксу слов
+    заголовка и тегов через индекс автодополнения.
+    """
     query = {}
     
     if category:
@@ -112,40 +1402,237 @@ async def get_objections(
         query["is_favorite"] = True
     
     if search:
-        query["$or"] = [
-            {"title": {"$regex": search, "$options": "i"}},
-            {"responses.text": {"$regex": search, "$options": "i"}}
-        ]
+        text_query = {**query, "$text": {"$search": search}}
+        if await db.objections.find_one(text_query, {"_id": True}):
+            return text_query
+        prefix_ids = autocomplete_index.prefix_ids(search, category, favorites_only)
+        if not prefix_ids:
+            return text_query
+        query["id"] = {"$in": autocomplete_index.top_ids(prefix_ids, SEARCH_PREFIX_MAX_IDS)}
+    
+    return query
+
+def search_objections(query: dict, projection: Optional[dict] = None, database=None):
+    """Курсор поиска: по релевантности для $text, иначе (поиск по префиксу) — по дате изменения"""
+    collection = (database if database is not None else read_db).objections
+    if "$text" not in query:
+        return collection.find(query, projection).sort([("updated_at", -1), ("id", -1)])
+    projection = {**projection, **TEXT_SCORE_PROJECTION} if projection else TEXT_SCORE_PROJECTION
+    return collection.find(query, projection).sort(
+        [("score", {"$meta": "textScore"}), ("updated_at", -1)]
+    )
+
+def objection_shape(view: str, fields: Optional[str]) -> tuple:
+    """Проекция MongoDB и преобразование документа в ответ для view/fields"""
+    if fields:
+        requested = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = set(requested) - set(Objection.model_fields)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Неизвестные поля: {', '.join(sorted(unknown))}")
+        output = ["id"] + [field for field in requested if field != "id"]
+        # updated_at нужен для курсора следующей страницы, даже если не запрошен
+        projection = {**dict.fromkeys(output, True), "updated_at": True, "_id": False}
+        return projection, lambda doc: {field: doc.get(field) for field in output}
+    if view == "summary":
+        projection = {**dict.fromkeys(ObjectionSummary.model_fields, True), "_id": False}
+        return projection, lambda doc: ObjectionSummary(**doc).dict()
+    return None, lambda doc: Objection(**doc).dict()
+
+# Ответы возражений. При замене списка ответов (PUT, импорт) ответы с тем же
+# текстом сохраняют id и created_at, а сам список перезаписывается, только
+# если он действительно изменился.
+# RESPONSE_DEDUP=1 дополнительно не допускает повторов текста внутри возражения.
+RESPONSE_DEDUP = os.environ.get("RESPONSE_DEDUP", "0") == "1"
+RESPONSES_CAS_ATTEMPTS = 5
+
+def merge_responses(current: list, texts: list) -> list:
+    """Список ответов для texts; ответы с тем же текстом переиспользуются из current"""
+    existing = collections.defaultdict(collections.deque)
+    for response in current:
+        existing[response["text"]].append(response)
+    merged, seen = [], set()
+    for text in texts:
+        if RESPONSE_DEDUP and text in seen:
+            continue
+        seen.add(text)
+        merged.append(existing[text].popleft() if existing[text] else ObjectionResponse(text=text).dict())
+    return merged
+
+async def replace_responses(objection_id: str, build, fields: Optional[dict] = None) -> Optional[dict]:
+    """Записать build(текущие ответы) вместе с fields через compare-and-set.
+
+    Запись проходит, только если ответы не изменились с момента чтения, иначе
+    попытка повторяется. Возвращает обновленный документ или None, если
+    возражения нет.
+    """
+    for _ in range(RESPONSES_CAS_ATTEMPTS):
+        current = await db.objections.find_one({"id": objection_id}, {"_id": False, "responses": True})
+        if current is None:
+            return None
+        update = {**(fields or {}), "updated_at": datetime.utcnow()}
+        responses = build(current["responses"])
+        if responses != current["responses"]:
+            update["responses"] = responses
+        updated = await db.objections.find_one_and_update(
+            {"id": objection_id, "responses": current["responses"]},
+            {"$set": update},
+            return_document=ReturnDocument.AFTER
+        )
+        if updated:
+            return updated
+    raise HTTPException(status_code=409, detail="Ответы возражения изменены параллельно, повторите запрос")
+
+@api_router.get(
+    "/objections",
+    response_class=Response,
+    responses=cached_json_responses(
+        List[Union[Objection, ObjectionSummary]],
+        "Возражения целиком (view=full), облегченные записи (view=summary) или только поля "
+        "из fields; при stream=true — NDJSON",
+        ndjson=True,
+    ),
+)
+async def get_objections(
+    request: Request,
+    category: Optional[str] = None,
+    search: Optional[str] = None,
+    favorites_only: bool = False,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    view: str = Query("full", pattern="^(full|summary)$"),
+    fields: Optional[str] = None
+):
+    """Получить список возражений с возможностью фильтрации и постраничной выдачей.
+
+    view=summary отдает облегченные записи без ответов, fields=a,b,c — только
+    перечисленные поля (и id); проекция выполняется на стороне MongoDB.
+    """
+    projection, to_dict = objection_shape(view, fields)
+    
+    if search and cursor:
+        # Порядок по релевантности не совместим с keyset-курсором: отдаем top-N.
+        raise HTTPException(status_code=400, detail="Курсор не поддерживается вместе с поиском")
     
-    objections = await db.objections.find(query).sort("updated_at", -1).to_list(1000)
-    return [Objection(**objection) for objection in objections]
+    if stream:
+        query = await objection_filter(category, search, favorites_only)
+        if search:
+            return stream_ndjson(search_objections(query, projection).limit(limit), to_dict)
+        return stream_ndjson(keyset_find(read_db.objections, query, "updated_at", cursor, projection), to_dict)
+    
+    cache_key = ("list", category, search, favorites_only, limit, cursor, view, fields)
+    cached = read_cache.get("objections", cache_key)
+    if cached is None:
+        generation = read_cache.generation("objections")
+        query = await objection_filter(category, search, favorites_only)
+        if search:
+            docs = await search_objections(query, projection, db).to_list(limit)
+            next_cursor = None
+        else:
+            docs, next_cursor = await fetch_page(db.objections, query, "updated_at", limit, cursor, projection)
+        body = orjson.dumps([to_dict(objection) for objection in docs])
+        cached = (body, body_etag(body), next_cursor)
+        read_cache.put("objections", cache_key, cached, len(body), generation)
+    
+    return cached_json_response(request, *cached)
 
 @api_router.post("/objections", response_model=Objection)
 async def create_objection(objection_data: ObjectionCreate):
     """Создать новое возражение"""
-    # Преобразуем список строк в список ObjectionResponse
-    responses = [
-        ObjectionResponse(text=response_text)
-        for response_text in objection_data.responses
-    ]
-    
     objection = Objection(
         title=objection_data.title,
-        responses=responses,
+        responses=merge_responses([], objection_data.responses),
         category=objection_data.category,
         tags=objection_data.tags
     )
     
-    await db.objections.insert_one(objection.dict())
+    document = objection.dict()
+    await db.objections.insert_one(document)
+    read_cache.invalidate("objections", objection.id)
+    autocomplete_index.upsert(document)
     return objection
 
-@api_router.get("/objections/{objection_id}", response_model=Objection)
-async def get_objection(objection_id: str):
+@api_router.post("/objections/import")
+async def import_objections(request: Request, format: str = "ndjson"):
+    """Массовый импорт возражений из NDJSON или CSV (upsert по id или заголовку)"""
+    rows = import_rows_source(request, format, ("responses", "tags"))
+    return await import_rows(
+        "objections", rows, ObjectionImport, objection_upsert, stored_objection_responses,
+        index_written_objections
+    )
+
+@api_router.get("/objections/export")
+async def export_objections(format: str = "ndjson"):
+    """Потоковый экспорт возражений в NDJSON или CSV"""
+    return export_response("objections", OBJECTION_EXPORT_FIELDS, format, "objections")
+
+@api_router.get("/objections/facets")
+async def get_objection_facets(
+    request: Request,
+    category: Optional[str] = None,
+    search: Optional[str] = None,
+    favorites_only: bool = False,
+    tag_limit: int = Query(100, ge=1, le=1000)
+):
+    """Количество возражений по категориям и тегам и число избранных (одной агрегацией)"""
+    cache_key = ("facets", category, search, favorites_only, tag_limit)
+    cached = read_cache.get("objections", cache_key)
+    if cached is None:
+        generation = read_cache.generation("objections")
+        pipeline = [
+            {"$match": await objection_filter(category, search, favorites_only)},
+            {"$facet": {
+                "total": [{"$count": "count"}],
+                "favorites": [{"$match": {"is_favorite": True}}, {"$count": "count"}],
+                "categories": [
+                    {"$group": {"_id": "$category", "count": {"$sum": 1}}},
+                    {"$sort": {"count": -1, "_id": 1}}
+                ],
+                "tags": [
+                    {"$unwind": "$tags"},
+                    {"$group": {"_id": "$tags", "count": {"$sum": 1}}},
+                    {"$sort": {"count": -1, "_id": 1}},
+                    {"$limit": tag_limit}
+                ],
+            }}
+        ]
+        facets = (await db.objections.aggregate(pipeline).to_list(1))[0]
+        body = orjson.dumps({
+            "total": facets["total"][0]["count"] if facets["total"] else 0,
+            "favorites": facets["favorites"][0]["count"] if facets["favorites"] else 0,
+            "categories": [{"category": row["_id"], "count": row["count"]} for row in facets["categories"]],
+            "tags": [{"tag": row["_id"], "count": row["count"]} for row in facets["tags"]],
+        })
+        cached = (body, body_etag(body))
+        read_cache.put("objections", cache_key, cached, len(body), generation)
+    
+    return cached_json_response(request, *cached)
+
+@api_router.get("/objections/autocomplete")
+async def autocomplete_objections(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(10, ge=1, le=50)
+):
+    """Подсказки по заголовкам и тегам возражений с учетом опечаток"""
+    return autocomplete_index.suggest(q, limit)
+
+@api_router.get(
+    "/objections/{objection_id}",
+    response_class=Response,
+    responses=cached_json_responses(Objection, "Возражение"),
+)
+async def get_objection(objection_id: str, request: Request):
     """Получить конкретное возражение по ID"""
-    objection = await db.objections.find_one({"id": objection_id})
-    if not objection:
-        raise HTTPException(status_code=404, detail="Возражение не найдено")
-    return Objection(**objection)
+    cached = read_cache.get("objections", ("item", objection_id))
+    if cached is None:
+        generation = read_cache.generation("objections")
+        objection = await db.objections.find_one({"id": objection_id})
+        if not objection:
+            raise HTTPException(status_code=404, detail="Возражение не найдено")
+        cached = serialize_models(Objection(**objection))
+        read_cache.put("objections", ("item", objection_id), cached, len(cached[0]), generation)
+    
+    return cached_json_response(request, *cached)
 
 @api_router.put("/objections/{objection_id}", response_model=Objection)
 async def update_objection(objection_id: str, update_data: ObjectionUpdate):
@@ -153,23 +1640,24 @@ async def update_objection(objection_id: str, update_data: ObjectionUpdate):
     update_dict = {k: v for k, v in update_data.dict().items() if v is not None}
     
     if "responses" in update_dict:
-        # Преобразуем список строк в список ObjectionResponse
-        update_dict["responses"] = [
-            ObjectionResponse(text=response_text).dict()
-            for response_text in update_dict["responses"]
-        ]
-    
-    update_dict["updated_at"] = datetime.utcnow()
-    
-    result = await db.objections.update_one(
-        {"id": objection_id},
-        {"$set": update_dict}
-    )
+        # Неизменившиеся ответы сохраняют id, список пишется только при изменениях
+        texts = update_dict.pop("responses")
+        updated_objection = await replace_responses(
+            objection_id, lambda current: merge_responses(current, texts), update_dict
+        )
+    else:
+        update_dict["updated_at"] = datetime.utcnow()
+        updated_objection = await db.objections.find_one_and_update(
+            {"id": objection_id},
+            {"$set": update_dict},
+            return_document=ReturnDocument.AFTER
+        )
     
-    if result.matched_count == 0:
+    if not updated_objection:
         raise HTTPException(status_code=404, detail="Возражение не найдено")
+    read_cache.invalidate("objections", objection_id)
+    autocomplete_index.upsert(updated_objection)
     
-    updated_objection = await db.objections.find_one({"id": objection_id})
     return Objection(**updated_objection)
 
 @api_router.delete("/objections/{objection_id}")
@@ -178,47 +1666,217 @@ async def delete_objection(objection_id: str):
     result = await db.objections.delete_one({"id": objection_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Возражение не найдено")
+    read_cache.invalidate("objections", objection_id)
+    autocomplete_index.remove(objection_id)
     return {"message": "Возражение удалено"}
 
+@api_router.post("/objections/{objection_id}/responses", response_model=ObjectionResponse)
+async def add_objection_response(objection_id: str, response_data: ObjectionResponseCreate):
+    """Добавить один ответ к возражению"""
+    response = ObjectionResponse(text=response_data.text)
+    push = {"$each": [response.dict()]}
+    if response_data.position is not None:
+        push["$position"] = response_data.position
+    query = {"id": objection_id}
+    if RESPONSE_DEDUP:
+        query["responses.text"] = {"$ne": response.text}
+    
+    result = await db.objections.update_one(
+        query, {"$push": {"responses": push}, "$set": {"updated_at": datetime.utcnow()}}
+    )
+    if result.matched_count == 0:
+        # С дедупликацией повторное добавление того же текста возвращает имеющийся ответ
+        existing = await db.objections.find_one(
+            {"id": objection_id}, {"_id": False, "responses": {"$elemMatch": {"text": response.text}}}
+        )
+        if not existing:
+            raise HTTPException(status_code=404, detail="Возражение не найдено")
+        if not existing.get("responses"):
+            raise HTTPException(status_code=409, detail="Ответы возражения изменены параллельно, повторите запрос")
+        return ObjectionResponse(**existing["responses"][0])
+    read_cache.invalidate("objections", objection_id)
+    return response
+
+@api_router.put("/objections/{objection_id}/responses/{response_id}", response_model=ObjectionResponse)
+async def update_objection_response(objection_id: str, response_id: str, response_data: ObjectionResponseUpdate):
+    """Изменить текст одного ответа (позиционное обновление элемента массива)"""
+    query = {"id": objection_id, "responses.id": response_id}
+    if RESPONSE_DEDUP:
+        query["responses"] = {"$not": {"$elemMatch": {"id": {"$ne": response_id}, "text": response_data.text}}}
+    
+    objection = await db.objections.find_one_and_update(
+        query,
+        {"$set": {"responses.$.text": response_data.text, "updated_at": datetime.utcnow()}},
+        projection={"_id": False, "responses": {"$elemMatch": {"id": response_id}}},
+        return_document=ReturnDocument.AFTER
+    )
+    if not objection:
+        if RESPONSE_DEDUP and await db.objections.count_documents(
+            {"id": objection_id, "responses.id": response_id}, limit=1
+        ):
+            raise HTTPException(status_code=409, detail="У возражения уже есть ответ с таким текстом")
+        raise HTTPException(status_code=404, detail="Ответ не найден")
+    read_cache.invalidate("objections", objection_id)
+    return ObjectionResponse(**objection["responses"][0])
+
+@api_router.delete("/objections/{objection_id}/responses/{response_id}")
+async def delete_objection_response(objection_id: str, response_id: str):
+    """Удалить один ответ возражения"""
+    result = await db.objections.update_one(
+        {"id": objection_id, "responses.id": response_id},
+        {"$pull": {"responses": {"id": response_id}}, "$set": {"updated_at": datetime.utcnow()}}
+    )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Ответ не найден")
+    read_cache.invalidate("objections", objection_id)
+    return {"message": "Ответ удален"}
+
+@api_router.post("/objections/{objection_id}/responses/{response_id}/move", response_model=List[ObjectionResponse])
+async def move_objection_response(objection_id: str, response_id: str, move_data: ObjectionResponseMove):
+    """Переместить ответ на новую позицию в списке ответов"""
+    def move(current: list) -> list:
+        moved = next((response for response in current if response["id"] == response_id), None)
+        if moved is None:
+            raise HTTPException(status_code=404, detail="Ответ не найден")
+        responses = [response for response in current if response["id"] != response_id]
+        responses.insert(move_data.position, moved)
+        return responses
+    
+    objection = await replace_responses(objection_id, move)
+    if not objection:
+        raise HTTPException(status_code=404, detail="Возражение не найдено")
+    read_cache.invalidate("objections", objection_id)
+    return [ObjectionResponse(**response) for response in objection["responses"]]
+
 @api_router.post("/objections/{objection_id}/toggle-favorite")
 async def toggle_favorite(objection_id: str):
     """Переключить статус избранного для возражения"""
-    objection = await db.objections.find_one({"id": objection_id})
-    if not objection:
-        raise HTTPException(status_code=404, detail="Возражение не найдено")
-    
-    new_favorite_status = not objection.get("is_favorite", False)
-    
-    await db.objections.update_one(
+    # Атомарное переключение на стороне сервера за один запрос (pipeline-обновление)
+    objection = await db.objections.find_one_and_update(
         {"id": objection_id},
-        {"$set": {"is_favorite": new_favorite_status, "updated_at": datetime.utcnow()}}
+        [{"$set": {
+            "is_favorite": {"$not": [{"$ifNull": ["$is_favorite", False]}]},
+            "updated_at": datetime.utcnow()
+        }}],
+        projection={"_id": False, "is_favorite": True},
+        return_document=ReturnDocument.AFTER
     )
+    if not objection:
+        raise HTTPException(status_code=404, detail="Возражение не найдено")
+    read_cache.invalidate("objections", objection_id)
+    autocomplete_index.set_favorite(objection_id, objection["is_favorite"])
     
-    return {"is_favorite": new_favorite_status}
+    return {"is_favorite": objection["is_favorite"]}
 
 @api_router.post("/objections/{objection_id}/increment-usage")
 async def increment_usage_count(objection_id: str):
-    """Увеличить счетчик использования возражения"""
-    result = await db.objections.update_one(
-        {"id": objection_id},
-        {"$inc": {"usage_count": 1}, "$set": {"updated_at": datetime.utcnow()}}
-    )
-    
-    if result.matched_count == 0:
+    """Увеличить счетчик использования возражения (запись в БД выполняется пакетно)"""
+    exists = await db.objections.count_documents({"id": objection_id}, limit=1)
+    if not exists:
         raise HTTPException(status_code=404, detail="Возражение не найдено")
     
+    usage_counters.add(objection_id)
     return {"message": "Счетчик использования увеличен"}
 
+@api_router.get("/usage-counters/metrics")
+async def get_usage_counter_metrics():
+    """Статистика пакетной записи счетчиков использования"""
+    return usage_counters.metrics()
+
+# Analytics endpoints
+@api_router.get("/analytics/top")
+async def get_top_objections(
+    days: int = Query(7, ge=1, le=ANALYTICS_MAX_DAYS),
+    limit: int = Query(10, ge=1, le=100),
+    category: Optional[str] = None
+):
+    """Самые используемые возражения за последние days суток"""
+    match = {"dimension": "objection", "granularity": "day", "bucket": {"$gte": analytics_since("day", days)}}
+    if category:
+        match["category"] = category
+    top = await sum_rollups(match, "key", limit)
+    titles = {
+        doc["id"]: doc
+        async for doc in read_db.objections.find(
+            {"id": {"$in": [row["_id"] for row in top]}},
+            {"_id": False, "id": True, "title": True, "category": True}
+        )
+    }
+    return [
+        {
+            "objection_id": row["_id"],
+            "title": titles.get(row["_id"], {}).get("title"),
+            "category": titles.get(row["_id"], {}).get("category"),
+            "count": row["count"],
+        }
+        for row in top
+    ]
+
+@api_router.get("/analytics/categories")
+async def get_category_usage(
+    days: int = Query(30, ge=1, le=ANALYTICS_MAX_DAYS),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """Использование возражений по категориям за последние days суток (limit самых используемых)"""
+    match = {"dimension": "category", "granularity": "day", "bucket": {"$gte": analytics_since("day", days)}}
+    rows = await sum_rollups(match, "key", limit)
+    return [{"category": row["_id"], "count": row["count"]} for row in rows]
+
+@api_router.get("/analytics/trend")
+async def get_usage_trend(
+    objection_id: Optional[str] = None,
+    category: Optional[str] = None,
+    granularity: str = Query("day", pattern="^(hour|day)$"),
+    days: int = Query(30, ge=1, le=ANALYTICS_MAX_DAYS)
+):
+    """Динамика использования по часам или дням: по возражению, категории или в целом"""
+    if granularity == "hour" and days > ANALYTICS_HOURLY_RETENTION_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Почасовая статистика хранится {ANALYTICS_HOURLY_RETENTION_DAYS} дней"
+        )
+    match = {"granularity": granularity, "bucket": {"$gte": analytics_since(granularity, days)}}
+    if objection_id:
+        match.update({"dimension": "objection", "key": objection_id})
+    elif category:
+        match.update({"dimension": "category", "key": category})
+    else:
+        # Сумма по всем категориям равна общему числу использований
+        match["dimension"] = "category"
+    rows = await sum_rollups(match, "bucket")
+    return [{"bucket": row["_id"], "count": row["count"]} for row in rows]
+
 # Quotes endpoints
-@api_router.get("/quotes", response_model=List[Quote])
-async def get_quotes(category: Optional[str] = None):
-    """Получить список цитат"""
+@api_router.get(
+    "/quotes",
+    response_class=Response,
+    responses=cached_json_responses(List[Quote], "Цитаты; при stream=true — NDJSON", ndjson=True),
+)
+async def get_quotes(
+    request: Request,
+    category: Optional[str] = None,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False
+):
+    """Получить список цитат с постраничной выдачей"""
     query = {}
     if category:
         query["category"] = category
     
-    quotes = await db.quotes.find(query).sort("created_at", -1).to_list(1000)
-    return [Quote(**quote) for quote in quotes]
+    if stream:
+        return stream_ndjson(keyset_find(read_db.quotes, query, "created_at", cursor), lambda doc: Quote(**doc).dict())
+    
+    cache_key = ("list", category, limit, cursor)
+    cached = read_cache.get("quotes", cache_key)
+    if cached is None:
+        generation = read_cache.generation("quotes")
+        docs, next_cursor = await fetch_page(db.quotes, query, "created_at", limit, cursor)
+        body, etag = serialize_models([Quote(**quote) for quote in docs])
+        cached = (body, etag, next_cursor)
+        read_cache.put("quotes", cache_key, cached, len(body), generation)
+    
+    return cached_json_response(request, *cached)
 
 @api_router.post("/quotes", response_model=Quote)
 async def create_quote(quote_data: QuoteCreate):
@@ -230,31 +1888,40 @@ async def create_quote(quote_data: QuoteCreate):
     )
     
     await db.quotes.insert_one(quote.dict())
+    read_cache.invalidate("quotes")
     return quote
 
+@api_router.post("/quotes/import")
+async def import_quotes(request: Request, format: str = "ndjson"):
+    """Массовый импорт цитат из NDJSON или CSV (upsert по id или тексту)"""
+    rows = import_rows_source(request, format, ())
+    return await import_rows("quotes", rows, QuoteImport, quote_upsert)
+
+@api_router.get("/quotes/export")
+async def export_quotes(format: str = "ndjson"):
+    """Потоковый экспорт цитат в NDJSON или CSV"""
+    return export_response("quotes", QUOTE_EXPORT_FIELDS, format, "quotes")
+
 # Search endpoint
 @api_router.get("/search")
-async def search_content(q: str, type: Optional[str] = None):
-    """Поиск по возражениям и цитатам"""
+async def search_content(
+    q: str,
+    type: Optional[str] = None,
+    view: str = Query("full", pattern="^(full|summary)$"),
+    fields: Optional[str] = None
+):
+    """Поиск по возражениям и цитатам (view/fields ограничивают поля возражений)"""
     results = {"objections": [], "quotes": []}
     
     if not type or type == "objections":
-        objections = await db.objections.find({
-            "$or": [
-                {"title": {"$regex": q, "$options": "i"}},
-                {"responses.text": {"$regex": q, "$options": "i"}},
-                {"tags": {"$regex": q, "$options": "i"}}
-            ]
-        }).to_list(100)
-        results["objections"] = [Objection(**obj) for obj in objections]
+        projection, to_dict = objection_shape(view, fields)
+        objections = await search_objections(await objection_filter(None, q, False), projection).to_list(100)
+        results["objections"] = [to_dict(obj) for obj in objections]
     
     if not type or type == "quotes":
-        quotes = await db.quotes.find({
-            "$or": [
-                {"text": {"$regex": q, "$options": "i"}},
-                {"author": {"$regex": q, "$options": "i"}}
-            ]
-        }).to_list(100)
+        quotes = await read_db.quotes.find(
+            {"$text": {"$search": q}}, TEXT_SCORE_PROJECTION
+        ).sort([("score", {"$meta": "textScore"})]).to_list(100)
         results["quotes"] = [Quote(**quote) for quote in quotes]
     
     return results
@@ -371,6 +2038,10 @@ async def initialize_data():
     if quotes_to_insert:
         await db.quotes.insert_many(quotes_to_insert)
     
+    read_cache.invalidate("objections")
+    read_cache.invalidate("quotes")
+    await rebuild_autocomplete_index()
+    
     return {
         "message": "Данные успешно инициализированы",
         "objections_added": len(objections_to_insert),
@@ -386,15 +2057,100 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
 )
+app.add_middleware(MetricsMiddleware)
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+@app.get("/metrics")
+async def metrics():
+    """Метрики приложения в текстовом формате Prometheus"""
+    lines = []
+    for metric in (http_request_duration, mongo_command_duration, mongo_documents_returned, mongo_command_failures):
+        lines.extend(metric.render())
+    for name, value in read_cache.stats.items():
+        lines.append(f'read_cache_events_total{{event="{name}"}} {value}')
+    lines.append(f"read_cache_bytes {read_cache.total_bytes}")
+    for name, value in usage_counters.metrics().items():
+        lines.append(f"usage_counters_{name} {value}")
+    return Response(content="\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+def find_plan_stages(plan) -> set:
+    """Собрать имена всех стадий из дерева плана explain()"""
+    stages = set()
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.add(plan["stage"])
+        for value in plan.values():
+            stages |= find_plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            stages |= find_plan_stages(item)
+    return stages
+
+async def check_query_plans():
+    """Убедиться, что ни один горячий запрос не выполняется полным сканированием коллекции"""
+    collscans = []
+    for collection_name, query, sort in HOT_QUERIES:
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        if "COLLSCAN" in find_plan_stages(explain["queryPlanner"]["winningPlan"]):
+            collscans.append(f"{collection_name} {query} sort={sort}")
+    if collscans:
+        for description in collscans:
+            logger.error("Query plan is a COLLSCAN: %s", description)
+        raise RuntimeError(f"COLLSCAN in hot query plans: {'; '.join(collscans)}")
+    logger.info("Query plan self-check passed for %d hot queries", len(HOT_QUERIES))
+
+@app.on_event("startup")
+async def connect_to_mongo():
+    """Создать клиент MongoDB в воркере и прогреть пул соединений"""
+    if client is None:
+        bind_database(create_mongo_client(), MONGO_DB_NAME)
+    started = time.perf_counter()
+    # Параллельные ping открывают сразу несколько соединений пула
+    await asyncio.gather(*(client.admin.command("ping") for _ in range(max(1, MONGO_WARMUP_CONNECTIONS))))
+    logger.info(
+        "MongoDB connection pool warmed up (%d connections) in %.1f ms",
+        max(1, MONGO_WARMUP_CONNECTIONS), (time.perf_counter() - started) * 1000
+    )
+
+@app.on_event("startup")
+async def ensure_indexes():
+    """Создать индексы коллекций (идемпотентно) и проверить планы горячих запросов"""
+    for collection_name, index_models in INDEXES.items():
+        started = time.perf_counter()
+        names = await db[collection_name].create_indexes(index_models)
+        logger.info(
+            "Indexes on %s are ready in %.1f ms: %s",
+            collection_name, (time.perf_counter() - started) * 1000, ", ".join(names)
+        )
+    if INDEX_SELF_CHECK:
+        await check_query_plans()
+
+@app.on_event("startup")
+async def build_autocomplete_index():
+    await rebuild_autocomplete_index()
+
+# Фоновые задачи воркера (change stream или опрос автодополнения); отменяются при остановке
+background_tasks = []
+
+@app.on_event("startup")
+async def start_background_tasks():
+    usage_counters.start()
+    if CACHE_CHANGE_STREAMS:
+        background_tasks.append(asyncio.get_running_loop().create_task(watch_collection_changes()))
+    else:
+        # Без change stream записи других воркеров попадают в автодополнение опросом
+        background_tasks.append(asyncio.get_running_loop().create_task(run_autocomplete_sync()))
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    await usage_counters.stop()
+    if client is not None:
+        client.close()
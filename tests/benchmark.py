@@ -0,0 +1,403 @@
+"""Нагрузочный бенчмарк API ПРОДАЖНИК.
+
+Засевает синтетический каталог возражений и цитат с кириллическим текстом,
+конкурентно прогоняет каждый маршрут api_router через httpx.ASGITransport
+(без сетевого стека) и сохраняет p50/p95/p99 и RPS успешных (2xx) ответов по
+маршрутам в JSON, чтобы сравнивать прогоны между коммитами.
+
+Примеры запуска из корня репозитория:
+
+    # локальный mongod из backend/.env (MONGO_URL), каталог в 100k возражений
+    python -m tests.benchmark --objections 100000
+
+    # без MongoDB, in-process на mongomock-motor
+    python -m tests.benchmark --backend mongomock --objections 10000
+
+    # сравнить с прошлым прогоном
+    python -m tests.benchmark --compare benchmark_abc1234.json
+
+Бенчмарк работает с отдельной базой (--db-name) и очищает ее перед засевом.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import server  # noqa: E402
+
+WORDS = [
+    "цена", "дорого", "бюджет", "подумать", "поставщик", "конкуренты", "сложно",
+    "время", "руководство", "договор", "скидка", "качество", "гарантия", "сроки",
+    "внедрение", "обучение", "поддержка", "интеграция", "рассрочка", "окупаемость",
+    "клиент", "решение", "выгода", "экономия", "риск", "доверие", "опыт", "результат",
+]
+CATEGORIES = ["Цена", "Сомнения", "Конкуренты", "Бюджет", "Сложность", "Сроки", "Доверие"]
+AUTHORS = ["Брайан Трейси", "Джеффри Гитомер", "Зиг Зиглар", "Дэвид Сэндлер", "Фрэнк Беттджер"]
+SEED_BATCH_SIZE = 10_000
+# Строк в одном запросе импорта. mongomock не использует индексы, и каждый upsert
+# сканирует коллекцию, поэтому на нем импорт меряется на маленьких пачках.
+IMPORT_ROWS = {"mongod": 1000, "mongomock": 20}
+
+
+def phrase(rng: random.Random, min_words: int, max_words: int) -> str:
+    words = rng.choices(WORDS, k=rng.randint(min_words, max_words))
+    return " ".join(words).capitalize() + "."
+
+
+def synthetic_objection(rng: random.Random, created_at: datetime) -> dict:
+    responses = [
+        server.ObjectionResponse(text=phrase(rng, 12, 30), created_at=created_at).dict()
+        for _ in range(rng.randint(3, 5))
+    ]
+    return server.Objection(
+        title=phrase(rng, 3, 7),
+        responses=responses,
+        category=rng.choice(CATEGORIES),
+        tags=rng.sample(WORDS, 3),
+        is_favorite=rng.random() < 0.1,
+        usage_count=rng.randint(0, 500),
+        created_at=created_at,
+        updated_at=created_at,
+    ).dict()
+
+
+def synthetic_quote(rng: random.Random, created_at: datetime) -> dict:
+    return server.Quote(
+        text=phrase(rng, 8, 20), author=rng.choice(AUTHORS),
+        category=rng.choice(CATEGORIES), created_at=created_at
+    ).dict()
+
+
+async def seed(db, objections: int, quotes: int, disposable: int, rng: random.Random) -> dict:
+    """Очистить базу и засеять каталог; вернуть id для маршрутов с параметрами пути"""
+    for collection_name in ("objections", "quotes", "status_checks", "usage_rollups"):
+        await db[collection_name].delete_many({})
+
+    started = time.perf_counter()
+    now = datetime.utcnow()
+    objection_ids, response_ids = [], {}
+    for offset in range(0, objections + disposable, SEED_BATCH_SIZE):
+        batch = [
+            synthetic_objection(rng, now - timedelta(seconds=offset + i))
+            for i in range(min(SEED_BATCH_SIZE, objections + disposable - offset))
+        ]
+        await db.objections.insert_many(batch)
+        objection_ids.extend(doc["id"] for doc in batch)
+        response_ids.update((doc["id"], [response["id"] for response in doc["responses"]]) for doc in batch)
+    for offset in range(0, quotes, SEED_BATCH_SIZE):
+        batch = [
+            synthetic_quote(rng, now - timedelta(seconds=offset + i))
+            for i in range(min(SEED_BATCH_SIZE, quotes - offset))
+        ]
+        await db.quotes.insert_many(batch)
+    print(f"Seeded {objections} objections and {quotes} quotes in {time.perf_counter() - started:.1f}s")
+
+    return {
+        "objection_ids": objection_ids[:objections],
+        "disposable_ids": objection_ids[objections:],
+        "response_ids": response_ids,
+        # Первые ответы возражений редактируются и перемещаются, остальные удаляются
+        "disposable_responses": [
+            (oid, response_id) for oid in objection_ids[:objections] for response_id in response_ids[oid][1:]
+        ],
+    }
+
+
+def typo(rng: random.Random, word: str) -> str:
+    if len(word) < 4 or rng.random() < 0.5:
+        return word
+    position = rng.randrange(1, len(word))
+    return word[:position] + word[position + 1:]
+
+
+def first_response(state: dict, rng: random.Random) -> dict:
+    objection_id = rng.choice(state["objection_ids"])
+    return {"objection_id": objection_id, "response_id": state["response_ids"][objection_id][0]}
+
+
+def ndjson_body(rows: list) -> bytes:
+    return "\n".join(json.dumps(row, ensure_ascii=False) for row in rows).encode()
+
+
+def objection_import_body(rng: random.Random, rows: int) -> bytes:
+    return ndjson_body([
+        {
+            "title": phrase(rng, 3, 7),
+            "responses": [phrase(rng, 12, 30) for _ in range(3)],
+            "category": rng.choice(CATEGORIES),
+            "tags": rng.sample(WORDS, 3),
+        }
+        for _ in range(rows)
+    ])
+
+
+def quote_import_body(rng: random.Random, rows: int) -> bytes:
+    return ndjson_body([
+        {"text": phrase(rng, 8, 20), "author": rng.choice(AUTHORS), "category": rng.choice(CATEGORIES)}
+        for _ in range(rows)
+    ])
+
+
+# Сценарии маршрутов: (метод, шаблон пути) -> фабрика параметров запроса.
+# Фабрика получает состояние засева, генератор случайных чисел и номер запроса.
+# max_requests ограничивает число вызовов тяжелых маршрутов (экспорт всего каталога и т.п.),
+# available — число вызовов, на которое хватает засеянных данных (удаляемых записей).
+# needs_text — маршрут работает только с полнотекстовым индексом ($text), text_variants —
+# часть вариантов запроса его требует: без индекса (mongomock) они не выполняются.
+SCENARIOS = {
+    ("GET", "/api/"): {"build": lambda state, rng, i: {}},
+    ("POST", "/api/status"): {"build": lambda state, rng, i: {"json": {"client_name": f"bench-{i}"}}},
+    ("GET", "/api/status"): {"build": lambda state, rng, i: {"params": {"limit": 100}}},
+    ("GET", "/api/objections"): {"build": lambda state, rng, i: {"params": rng.choice([
+        {"limit": 100},
+        {"category": rng.choice(CATEGORIES), "limit": 100},
+        {"favorites_only": "true", "limit": 100},
+        {"view": "summary", "limit": 1000},
+        *text_search_params(state, {"search": rng.choice(WORDS), "limit": 50}),
+    ])}, "text_variants": True},
+    ("POST", "/api/objections"): {"build": lambda state, rng, i: {"json": {
+        "title": phrase(rng, 3, 7), "responses": [phrase(rng, 12, 30)],
+        "category": rng.choice(CATEGORIES), "tags": rng.sample(WORDS, 2),
+    }}},
+    ("POST", "/api/objections/import"): {
+        "build": lambda state, rng, i: {"content": objection_import_body(rng, state["import_rows"])},
+        "max_requests": 10,
+    },
+    ("GET", "/api/objections/facets"): {"build": lambda state, rng, i: {"params": rng.choice([
+        {}, {"category": rng.choice(CATEGORIES)}, {"favorites_only": "true"},
+        *text_search_params(state, {"search": rng.choice(WORDS)}),
+    ])}, "text_variants": True},
+    ("GET", "/api/objections/autocomplete"): {"build": lambda state, rng, i: {"params": {
+        # Набор по буквам: префикс случайной длины, иногда с опечаткой
+        "q": typo(rng, rng.choice(WORDS)[:rng.randint(2, 8)]),
+    }}},
+    ("GET", "/api/objections/export"): {"build": lambda state, rng, i: {}, "max_requests": 3},
+    ("GET", "/api/objections/{objection_id}"): {
+        "build": lambda state, rng, i: {"path": {"objection_id": rng.choice(state["objection_ids"])}},
+    },
+    ("PUT", "/api/objections/{objection_id}"): {"build": lambda state, rng, i: {
+        "path": {"objection_id": rng.choice(state["objection_ids"])},
+        "json": {"tags": rng.sample(WORDS, 3)},
+    }},
+    ("DELETE", "/api/objections/{objection_id}"): {
+        "build": lambda state, rng, i: {"path": {"objection_id": state["disposable_ids"].pop()}},
+    },
+    ("POST", "/api/objections/{objection_id}/responses"): {"build": lambda state, rng, i: {
+        "path": {"objection_id": rng.choice(state["objection_ids"])},
+        "json": {"text": phrase(rng, 12, 30), "position": rng.choice([None, 0])},
+    }},
+    ("PUT", "/api/objections/{objection_id}/responses/{response_id}"): {"build": lambda state, rng, i: {
+        "path": first_response(state, rng),
+        "json": {"text": phrase(rng, 12, 30)},
+    }},
+    ("DELETE", "/api/objections/{objection_id}/responses/{response_id}"): {"build": lambda state, rng, i: {
+        "path": dict(zip(("objection_id", "response_id"), state["disposable_responses"].pop())),
+    }, "available": lambda state: len(state["disposable_responses"])},
+    ("POST", "/api/objections/{objection_id}/responses/{response_id}/move"): {"build": lambda state, rng, i: {
+        "path": first_response(state, rng),
+        "json": {"position": rng.randint(0, 2)},
+    }},
+    ("POST", "/api/objections/{objection_id}/toggle-favorite"): {
+        "build": lambda state, rng, i: {"path": {"objection_id": rng.choice(state["objection_ids"])}},
+    },
+    ("POST", "/api/objections/{objection_id}/increment-usage"): {
+        # Популярные возражения: большая часть копирований приходится на первые 20
+        "build": lambda state, rng, i: {"path": {"objection_id": rng.choice(state["objection_ids"][:20])}},
+    },
+    ("GET", "/api/usage-counters/metrics"): {"build": lambda state, rng, i: {}},
+    ("GET", "/api/analytics/top"): {"build": lambda state, rng, i: {"params": {"days": rng.choice([1, 7, 30])}}},
+    ("GET", "/api/analytics/categories"): {"build": lambda state, rng, i: {"params": {"days": 30}}},
+    ("GET", "/api/analytics/trend"): {"build": lambda state, rng, i: {"params": rng.choice([
+        {"granularity": "day", "days": 30},
+        {"granularity": "hour", "days": 1, "category": rng.choice(CATEGORIES)},
+        {"objection_id": rng.choice(state["objection_ids"][:20])},
+    ])}},
+    ("GET", "/api/quotes"): {"build": lambda state, rng, i: {"params": rng.choice([
+        {"limit": 100}, {"category": rng.choice(CATEGORIES), "limit": 100},
+    ])}},
+    ("POST", "/api/quotes"): {"build": lambda state, rng, i: {"json": {
+        "text": phrase(rng, 8, 20), "author": rng.choice(AUTHORS), "category": rng.choice(CATEGORIES),
+    }}},
+    ("POST", "/api/quotes/import"): {
+        "build": lambda state, rng, i: {"content": quote_import_body(rng, state["import_rows"])},
+        "max_requests": 10,
+    },
+    ("GET", "/api/quotes/export"): {"build": lambda state, rng, i: {}, "max_requests": 3},
+    ("GET", "/api/search"): {"build": lambda state, rng, i: {"params": rng.choice([
+        {"q": rng.choice(WORDS)}, {"q": rng.choice(WORDS), "view": "summary"},
+    ])}, "needs_text": True},
+    ("POST", "/api/initialize-data"): {"build": lambda state, rng, i: {}, "max_requests": 10},
+}
+
+
+def text_search_params(state: dict, *variants: dict) -> list:
+    """Варианты запроса с поиском, если бэкенд поддерживает $text"""
+    return list(variants) if state["text_search"] else []
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_route(http, method: str, path: str, scenario: dict, state: dict,
+                    requests: int, concurrency: int, rng: random.Random) -> dict:
+    """Выполнить requests вызовов маршрута с ограничением concurrency"""
+    total = min(requests, scenario.get("max_requests", requests))
+    if "available" in scenario:
+        total = min(total, scenario["available"](state))
+    latencies, status_codes = [], {}
+    next_index = iter(range(total))
+
+    async def worker():
+        for i in next_index:
+            spec = scenario["build"](state, rng, i)
+            url = path.format(**spec.get("path", {}))
+            started = time.perf_counter()
+            response = await http.request(
+                method, url, params=spec.get("params"), json=spec.get("json"), content=spec.get("content")
+            )
+            # Быстрые ошибки не должны улучшать перцентили
+            if 200 <= response.status_code < 300:
+                latencies.append(time.perf_counter() - started)
+            status_codes[str(response.status_code)] = status_codes.get(str(response.status_code), 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": sum(count for code, count in status_codes.items() if not code.startswith("2")),
+        "status_codes": status_codes,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def api_routes() -> list:
+    """Все (метод, путь) маршрутов api_router"""
+    routes = []
+    for route in server.api_router.routes:
+        for method in sorted(route.methods - {"HEAD", "OPTIONS"}):
+            routes.append((method, route.path))
+    return routes
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=BACKEND_DIR
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_report(results: dict, baseline: dict = None):
+    header = f"{'route':<68} {'n':>6} {'err':>5} {'p50':>9} {'p95':>9} {'p99':>9} {'rps':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, stats in results["routes"].items():
+        line = (
+            f"{name:<68} {stats['requests']:>6} {stats['errors']:>5} {stats['p50_ms']:>9.2f}"
+            f" {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f} {stats['rps']:>9.1f}"
+        )
+        previous = (baseline or {}).get("routes", {}).get(name)
+        if previous and previous["p95_ms"]:
+            line += f"   p95 {(stats['p95_ms'] / previous['p95_ms'] - 1) * 100:+.1f}%"
+        print(line)
+    if results["skipped_routes"]:
+        print("Routes without a benchmark scenario:", ", ".join(results["skipped_routes"]))
+    if results.get("unsupported_routes"):
+        print("Not supported by this backend:", ", ".join(results["unsupported_routes"]))
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    if args.backend == "mongomock":
+        from mongomock_motor import AsyncMongoMockClient
+        server.bind_database(AsyncMongoMockClient(), args.db_name)
+    else:
+        server.bind_database(server.create_mongo_client(), args.db_name)
+
+    routes = [(method, path) for method, path in api_routes() if not args.only or path in args.only]
+    deletes = args.requests if ("DELETE", "/api/objections/{objection_id}") in routes else 0
+    state = await seed(server.db, args.objections, args.quotes, deletes, rng)
+    state["import_rows"] = IMPORT_ROWS[args.backend]
+    # mongomock не поддерживает полнотекстовый поиск
+    state["text_search"] = args.backend == "mongod"
+    if args.backend == "mongod":
+        await server.ensure_indexes()
+    await server.rebuild_autocomplete_index()
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "config": {
+            "backend": args.backend, "objections": args.objections, "quotes": args.quotes,
+            "requests": args.requests, "concurrency": args.concurrency, "seed": args.seed,
+        },
+        "routes": {},
+        "skipped_routes": [],
+        "unsupported_routes": [],
+    }
+    # Исключения приложения учитываются как ответы 500
+    transport = httpx.ASGITransport(app=server.app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as http:
+        for method, path in routes:
+            scenario = SCENARIOS.get((method, path))
+            if scenario is None:
+                results["skipped_routes"].append(f"{method} {path}")
+                continue
+            if not state["text_search"] and scenario.get("needs_text"):
+                results["unsupported_routes"].append(f"{method} {path}")
+                continue
+            if not state["text_search"] and scenario.get("text_variants"):
+                results["unsupported_routes"].append(f"{method} {path} (search)")
+            results["routes"][f"{method} {path}"] = await run_route(
+                http, method, path, scenario, state, args.requests, args.concurrency, rng
+            )
+    await server.usage_counters.flush()
+
+    output = Path(args.output or f"benchmark_{results['commit']}.json")
+    output.write_text(json.dumps(results, ensure_ascii=False, indent=2))
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print_report(results, baseline)
+    print(f"Results saved to {output}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный бенчмарк API ПРОДАЖНИК")
+    parser.add_argument("--backend", choices=("mongod", "mongomock"), default="mongod",
+                        help="mongod из MONGO_URL или in-process mongomock-motor")
+    parser.add_argument("--db-name", default=os.environ.get("BENCHMARK_DB_NAME", "prodazhnik_benchmark"))
+    parser.add_argument("--objections", type=int, default=10_000, help="размер каталога возражений")
+    parser.add_argument("--quotes", type=int, default=1_000)
+    parser.add_argument("--requests", type=int, default=200, help="запросов на маршрут")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1911)
+    parser.add_argument("--only", nargs="*", help="прогнать только указанные пути маршрутов")
+    parser.add_argument("--output", help="файл результатов (по умолчанию benchmark_<commit>.json)")
+    parser.add_argument("--compare", help="JSON прошлого прогона для сравнения p95")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
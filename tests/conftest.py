@@ -0,0 +1,17 @@
+import sys
+from pathlib import Path
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+
+
+@pytest.fixture
+def mongo_db():
+    """Чистая база mongomock, подключенная к server вместо MongoDB"""
+    server.bind_database(AsyncMongoMockClient(), "tests")
+    server.read_cache.invalidate("objections")
+    yield server.db
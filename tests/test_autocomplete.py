@@ -0,0 +1,152 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import server
+
+
+def objection(objection_id: str, title: str, tags=(), usage_count: int = 0) -> dict:
+    return {"id": objection_id, "title": title, "tags": list(tags), "category": None, "usage_count": usage_count}
+
+
+def build_index(*docs) -> server.AutocompleteIndex:
+    index = server.AutocompleteIndex()
+    index.build(list(docs))
+    return index
+
+
+def suggested_ids(index: server.AutocompleteIndex, query: str, limit: int = 10) -> list:
+    return [suggestion["id"] for suggestion in index.suggest(query, limit)]
+
+
+def test_edit_distance_row():
+    assert server.edit_distance_row("дорого", "дорого", 1)[-1] == 0
+    assert server.edit_distance_row("дарого", "дорого", 1)[-1] == 1
+    # Строка содержит расстояния до всех префиксов второго слова
+    assert server.edit_distance_row("дор", "дорого", 1)[3] == 0
+    assert server.edit_distance_row("абвгд", "еёжзи", 1) is None
+
+
+def test_prefix_match_ranks_exact_word_above_completion():
+    index = build_index(
+        objection("1", "Это слишком дорого"),
+        objection("2", "Дорогой подарок"),
+        objection("3", "Нет бюджета"),
+    )
+    assert set(suggested_ids(index, "дор")) == {"1", "2"}
+    assert suggested_ids(index, "дорого")[0] == "1"
+    assert suggested_ids(index, "бюд") == ["3"]
+
+
+def test_typos_are_tolerated_for_longer_words():
+    index = build_index(objection("1", "Это слишком дорого"), objection("2", "Нет бюджета", tags=["бюджет"]))
+    assert suggested_ids(index, "дарого") == ["1"]
+    assert suggested_ids(index, "бюджт") == ["2"]
+    # Короткие слова (до 4 букв) сопоставляются только точно или как префикс
+    assert suggested_ids(index, "нит") == []
+
+
+def test_every_query_word_must_match():
+    index = build_index(
+        objection("1", "Это слишком дорого"),
+        objection("2", "Слишком сложно"),
+        objection("3", "Дорого и долго"),
+    )
+    assert suggested_ids(index, "слишком дор") == ["1"]
+    assert suggested_ids(index, "слишкм дор") == ["1"]
+    assert suggested_ids(index, "слишком бюд") == []
+
+
+def test_tags_and_yo_normalization():
+    index = build_index(objection("1", "Подумаю ещё", tags=["Сомнения"]))
+    assert suggested_ids(index, "еще") == ["1"]
+    assert suggested_ids(index, "сомн") == ["1"]
+
+
+def test_usage_count_breaks_ties():
+    index = build_index(objection("1", "Дорого", usage_count=1), objection("2", "Дорого", usage_count=50))
+    assert suggested_ids(index, "дорого") == ["2", "1"]
+    index.add_usage("1", 100)
+    assert suggested_ids(index, "дорого") == ["1", "2"]
+
+
+def test_upsert_replaces_terms_and_remove_drops_entry():
+    index = build_index(objection("1", "Это слишком дорого"))
+    index.upsert(objection("1", "Нужно подумать"))
+    assert suggested_ids(index, "дорого") == []
+    assert suggested_ids(index, "подум") == ["1"]
+    assert "дорого" not in index.term_postings and "дорого" not in index.sorted_terms
+    index.remove("1")
+    assert suggested_ids(index, "подум") == []
+    assert index.entries == {} and index.sorted_terms == [] and index.trigram_terms == {}
+    index.remove("1")
+
+
+def test_prefix_ids_apply_list_filters():
+    index = build_index(
+        {**objection("1", "Это слишком дорого"), "category": "Цена"},
+        {**objection("2", "Дорогой подарок"), "category": "Цена", "is_favorite": True},
+        {**objection("3", "Дорога долгая"), "category": "Сроки"},
+    )
+    assert index.prefix_ids("дор") == {"1", "2", "3"}
+    assert index.prefix_ids("дорогой") == {"2"}
+    assert index.prefix_ids("слишком дор") == {"1"}
+    assert index.prefix_ids("дор", category="Цена") == {"1", "2"}
+    assert index.prefix_ids("дор", favorites_only=True) == {"2"}
+    index.set_favorite("1", True)
+    assert index.prefix_ids("дор", category="Цена", favorites_only=True) == {"1", "2"}
+    assert index.prefix_ids("ццц") == set()
+
+
+def test_sync_picks_up_writes_and_deletes_from_other_workers(mongo_db):
+    async def scenario():
+        now = datetime.utcnow()
+        await mongo_db.objections.insert_many([
+            {**objection("1", "Это слишком дорого"), "updated_at": now},
+            {**objection("2", "Нет бюджета"), "updated_at": now},
+        ])
+        await server.rebuild_autocomplete_index()
+        # Запись другого воркера: переименование, новое возражение и удаление
+        await mongo_db.objections.update_one({"id": "1"}, {"$set": {"title": "Нужно подумать", "updated_at": now}})
+        await mongo_db.objections.insert_one({**objection("3", "Долгое внедрение"), "updated_at": now})
+        await mongo_db.objections.delete_one({"id": "2"})
+
+        assert await server.sync_autocomplete_index(now - timedelta(seconds=1)) == 2
+        assert suggested_ids(server.autocomplete_index, "подум") == ["1"]
+        assert suggested_ids(server.autocomplete_index, "дорого") == []
+        assert suggested_ids(server.autocomplete_index, "внедр") == ["3"]
+        assert suggested_ids(server.autocomplete_index, "бюдж") == ["2"]
+
+        assert await server.reconcile_autocomplete_deletes() == 1
+        assert suggested_ids(server.autocomplete_index, "бюдж") == []
+
+    asyncio.run(scenario())
+
+
+def test_import_updates_only_written_objections(mongo_db, monkeypatch):
+    async def scenario():
+        await mongo_db.objections.insert_many([objection("1", "Это слишком дорого"), objection("2", "Нет бюджета")])
+        await server.rebuild_autocomplete_index()
+
+        async def full_rebuild():
+            raise AssertionError("импорт не должен перестраивать индекс целиком")
+
+        monkeypatch.setattr(server, "rebuild_autocomplete_index", full_rebuild)
+
+        async def rows():
+            yield 1, {"id": "1", "title": "Нужно подумать", "responses": ["Что смущает?"]}
+            yield 2, {"title": "Долгое внедрение", "responses": ["Внедрим за неделю"]}
+            yield 3, {"id": "4", "responses": ["Без заголовка"]}
+
+        summary = await server.import_rows(
+            "objections", rows(), server.ObjectionImport, server.objection_upsert,
+            server.stored_objection_responses, server.index_written_objections,
+        )
+        assert (summary["inserted"], summary["updated"], summary["error_count"]) == (1, 1, 1)
+
+        assert suggested_ids(server.autocomplete_index, "подум") == ["1"]
+        assert suggested_ids(server.autocomplete_index, "дорого") == []
+        inserted = await mongo_db.objections.find_one({"title": "Долгое внедрение"})
+        assert suggested_ids(server.autocomplete_index, "внедр") == [inserted["id"]]
+        assert suggested_ids(server.autocomplete_index, "бюдж") == ["2"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,139 @@
+import asyncio
+import json
+
+import httpx
+
+import server
+
+TRICKY_OBJECTIONS = [
+    {
+        "id": "1",
+        "title": 'Скажите "честно", это дорого?',
+        "responses": ['Ответ с "кавычками"', "Первая строка\nвторая строка", "Цена | ценность"],
+        "category": "Цена",
+        "tags": ["бюджет", "a|b"],
+    },
+    {"id": "2", "title": "Нет времени", "responses": ["Понимаю,\r\nдавайте коротко"], "category": None, "tags": []},
+]
+
+
+def run_with_client(scenario):
+    async def main():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            await scenario(http)
+
+    asyncio.run(main())
+
+
+def ndjson(rows: list) -> bytes:
+    return b"".join(json.dumps(row, ensure_ascii=False).encode() + b"\n" for row in rows)
+
+
+def export_rows(response: httpx.Response) -> list:
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+class StreamedRequest:
+    """Тело запроса, приходящее заданными кусками"""
+
+    def __init__(self, body: bytes, chunk_size: int):
+        self.chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+
+    async def stream(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def read_rows(rows) -> list:
+    async def collect():
+        return [row async for row in rows]
+
+    return asyncio.run(collect())
+
+
+def test_csv_rows_keep_quoted_newlines_across_chunks():
+    body = '\ufeffid,title,responses\n1,"Это ""дорого""","раз\nдва | три"\r\n2,Нет времени,раз | два\n'.encode()
+    for chunk_size in (1, 2, 5, len(body)):
+        rows = read_rows(server.iter_csv_rows(StreamedRequest(body, chunk_size), ("responses",)))
+        assert rows == [
+            (1, {"id": "1", "title": 'Это "дорого"', "responses": ["раз\nдва", "три"]}),
+            (2, {"id": "2", "title": "Нет времени", "responses": ["раз", "два"]}),
+        ]
+
+
+def test_csv_list_cell_falls_back_to_separator():
+    assert server.csv_list_cell('["a|b", "c"]') == ["a|b", "c"]
+    assert server.csv_list_cell("a | b ||c") == ["a", "b", "c"]
+    assert server.csv_list_cell("[не JSON] | b") == ["[не JSON]", "b"]
+    assert server.csv_list_cell("[1, 2]") == ["[1, 2]"]
+
+
+def test_ndjson_round_trip(mongo_db):
+    async def scenario(http):
+        imported = await http.post("/api/objections/import", content=b"\xef\xbb\xbf" + ndjson(TRICKY_OBJECTIONS))
+        assert imported.json() == {"processed": 2, "inserted": 2, "updated": 0, "error_count": 0, "errors": []}
+        exported = await http.get("/api/objections/export")
+        assert export_rows(exported) == TRICKY_OBJECTIONS
+
+        await mongo_db.objections.delete_many({})
+        await http.post("/api/objections/import", content=exported.content)
+        assert export_rows(await http.get("/api/objections/export")) == TRICKY_OBJECTIONS
+
+    run_with_client(scenario)
+
+
+def test_csv_round_trip(mongo_db):
+    async def scenario(http):
+        await http.post("/api/objections/import", content=ndjson(TRICKY_OBJECTIONS))
+        exported = await http.get("/api/objections/export", params={"format": "csv"})
+        assert exported.status_code == 200
+
+        await mongo_db.objections.delete_many({})
+        imported = await http.post(
+            "/api/objections/import", params={"format": "csv"}, content=b"\xef\xbb\xbf" + exported.content
+        )
+        assert imported.json()["inserted"] == 2 and imported.json()["error_count"] == 0
+        assert export_rows(await http.get("/api/objections/export")) == TRICKY_OBJECTIONS
+        again = await http.get("/api/objections/export", params={"format": "csv"})
+        assert again.content == exported.content
+
+    run_with_client(scenario)
+
+
+def test_legacy_csv_list_cells(mongo_db):
+    async def scenario(http):
+        body = "title,responses,tags\nДорого,Раз | Два,цена|бюджет\n".encode()
+        await http.post("/api/objections/import", params={"format": "csv"}, content=body)
+        [row] = export_rows(await http.get("/api/objections/export"))
+        assert (row["responses"], row["tags"]) == (["Раз", "Два"], ["цена", "бюджет"])
+
+    run_with_client(scenario)
+
+
+def test_invalid_rows_are_reported_by_number(mongo_db):
+    async def scenario(http):
+        body = b"\n".join([
+            json.dumps({"title": "Дорого", "responses": ["Ответ"]}).encode(),
+            b"",
+            b"{not json",
+            b"[1, 2]",
+            json.dumps({"title": "Без ответов"}).encode(),
+            json.dumps({"title": "Плохие теги", "responses": ["Ответ"], "tags": "цена"}).encode(),
+        ])
+        summary = (await http.post("/api/objections/import", content=body)).json()
+        assert (summary["processed"], summary["inserted"], summary["error_count"]) == (5, 1, 4)
+        errors = {error["row"]: error["error"] for error in summary["errors"]}
+        assert errors[3].startswith("Некорректный JSON")
+        assert errors[4] == "Ожидается JSON-объект"
+        assert errors[5].startswith("responses: ")
+        assert errors[6].startswith("tags: ")
+
+        csv_body = 'title,responses\nДорого,Ответ\n,"Ответ"\n'.encode()
+        summary = (await http.post("/api/objections/import", params={"format": "csv"}, content=csv_body)).json()
+        assert summary["updated"] == 1
+        assert [error["row"] for error in summary["errors"]] == [2]
+        assert summary["errors"][0]["error"].startswith("title: ")
+
+    run_with_client(scenario)
@@ -0,0 +1,108 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+
+import server
+
+
+async def seed_tied_catalog(db, count: int = 23) -> list:
+    """Каталог, в котором updated_at повторяется у нескольких возражений подряд"""
+    base = datetime(2024, 1, 1)
+    docs = [
+        server.Objection(
+            title=f"Возражение {i}",
+            responses=[server.ObjectionResponse(text=f"Ответ {i}")],
+            category="Цена" if i % 2 else "Сроки",
+            updated_at=base + timedelta(seconds=i // 4),
+        ).dict()
+        for i in range(count)
+    ]
+    await db.objections.insert_many(docs)
+    return docs
+
+
+async def fetch_all_pages(http: httpx.AsyncClient, params: dict) -> list:
+    rows, cursor, pages = [], None, 0
+    while True:
+        page_params = {**params, **({"cursor": cursor} if cursor else {})}
+        response = await http.get("/api/objections", params=page_params)
+        assert response.status_code == 200
+        rows.extend(response.json())
+        pages += 1
+        cursor = response.headers.get(server.NEXT_CURSOR_HEADER)
+        if not cursor:
+            return rows
+        assert pages < 100
+
+
+def run_with_client(scenario):
+    async def main():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            await scenario(http)
+
+    asyncio.run(main())
+
+
+def expected_order(docs: list) -> list:
+    return [doc["id"] for doc in sorted(docs, key=lambda doc: (doc["updated_at"], doc["id"]), reverse=True)]
+
+
+def test_cursor_round_trip():
+    doc = {"updated_at": datetime(2024, 1, 1, 12, 30, 5, 123000), "id": "abc"}
+    assert server.decode_cursor(server.encode_cursor(doc, "updated_at")) == {"v": doc["updated_at"], "id": "abc"}
+
+
+def test_malformed_cursor_is_rejected(mongo_db):
+    async def scenario(http):
+        for cursor in ("zzz", "e30=", "eyJ2IjogMX0="):
+            response = await http.get("/api/objections", params={"cursor": cursor})
+            assert response.status_code == 400
+
+    run_with_client(scenario)
+
+
+def test_pages_cover_catalog_once_with_tied_timestamps(mongo_db):
+    async def scenario(http):
+        docs = await seed_tied_catalog(mongo_db)
+        for limit in (1, 3, 4, 5, 50):
+            rows = await fetch_all_pages(http, {"limit": limit})
+            assert [row["id"] for row in rows] == expected_order(docs)
+
+    run_with_client(scenario)
+
+
+def test_cursor_with_category_view_and_fields(mongo_db):
+    async def scenario(http):
+        docs = await seed_tied_catalog(mongo_db)
+        expected = expected_order([doc for doc in docs if doc["category"] == "Цена"])
+
+        rows = await fetch_all_pages(http, {"category": "Цена", "limit": 3})
+        assert [row["id"] for row in rows] == expected
+
+        rows = await fetch_all_pages(http, {"category": "Цена", "limit": 3, "view": "summary"})
+        assert [row["id"] for row in rows] == expected
+        assert all("responses" not in row for row in rows)
+
+        # updated_at не запрошен, но курсор все равно строится по нему
+        rows = await fetch_all_pages(http, {"category": "Цена", "limit": 3, "fields": "title"})
+        assert [row["id"] for row in rows] == expected
+        assert all(set(row) == {"id", "title"} for row in rows)
+
+    run_with_client(scenario)
+
+
+def test_stream_continues_from_cursor(mongo_db):
+    async def scenario(http):
+        docs = await seed_tied_catalog(mongo_db)
+        first = await http.get("/api/objections", params={"limit": 6})
+        cursor = first.headers[server.NEXT_CURSOR_HEADER]
+        streamed = await http.get("/api/objections", params={"stream": "true", "cursor": cursor})
+        assert streamed.headers["content-type"] == "application/x-ndjson"
+        ids = [row["id"] for row in first.json()] + [
+            server.orjson.loads(line)["id"] for line in streamed.text.splitlines()
+        ]
+        assert ids == expected_order(docs)
+
+    run_with_client(scenario)
@@ -0,0 +1,160 @@
+import asyncio
+
+import httpx
+from pymongo.errors import AutoReconnect
+
+import server
+
+
+def run_with_client(scenario):
+    async def main():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            await scenario(http)
+
+    asyncio.run(main())
+
+
+async def create_objection(http: httpx.AsyncClient, title: str) -> dict:
+    response = await http.post("/api/objections", json={"title": title, "responses": ["Ответ"]})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_put_ignores_fill_started_before_invalidation():
+    cache = server.ReadCache(ttl=60, max_entries=10, max_bytes=1024)
+    generation = cache.generation("objections")
+    cache.invalidate("objections", "a")
+    cache.put("objections", ("item", "a"), b"old", 3, generation)
+    assert cache.get("objections", ("item", "a")) is None
+    assert cache.stats["stale_fills"] == 1
+
+    cache.put("objections", ("item", "a"), b"new", 3, cache.generation("objections"))
+    assert cache.get("objections", ("item", "a")) == b"new"
+
+
+def test_read_racing_with_write_does_not_cache_old_body(mongo_db, monkeypatch):
+    async def scenario(http):
+        objection = await create_objection(http, "old")
+        collection_class = type(mongo_db.objections)
+        find_one = collection_class.find_one
+        read_started, write_done = asyncio.Event(), asyncio.Event()
+
+        async def slow_find_one(collection, *args, **kwargs):
+            # Чтение получает документ до записи, а завершается после нее
+            doc = await find_one(collection, *args, **kwargs)
+            if collection.name == "objections" and not read_started.is_set():
+                read_started.set()
+                await write_done.wait()
+            return doc
+
+        monkeypatch.setattr(collection_class, "find_one", slow_find_one)
+        slow_get = asyncio.create_task(http.get(f"/api/objections/{objection['id']}"))
+        await read_started.wait()
+        response = await http.put(f"/api/objections/{objection['id']}", json={"title": "new"})
+        assert response.status_code == 200
+        write_done.set()
+        assert (await slow_get).json()["title"] == "old"
+
+        response = await http.get(f"/api/objections/{objection['id']}")
+        assert response.json()["title"] == "new"
+
+    run_with_client(scenario)
+
+
+class FakeChangeStream:
+    def __init__(self, changes, error):
+        self.changes = changes
+        self.error = error
+        self.resume_token = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.changes:
+            change = self.changes.pop(0)
+            self.resume_token = {"_data": change["_id"]}
+            return change
+        if self.error:
+            raise self.error
+        await asyncio.Event().wait()
+
+
+class FakeDatabase:
+    """db.watch(), который отдает заданные пачки событий и обрывается ошибкой"""
+
+    def __init__(self, runs):
+        self.runs = runs
+        self.resume_tokens = []
+
+    def watch(self, pipeline, full_document=None, resume_after=None):
+        self.resume_tokens.append(resume_after)
+        changes, error = self.runs.pop(0)
+        return FakeChangeStream(changes, error)
+
+
+def test_change_stream_restarts_from_resume_token(monkeypatch):
+    async def scenario():
+        change = {"_id": "t1", "ns": {"coll": "quotes"}, "operationType": "insert"}
+        fake_db = FakeDatabase([
+            ([change], AutoReconnect("primary stepped down")),
+            ([{**change, "_id": "t2"}], None),
+        ])
+        monkeypatch.setattr(server, "db", fake_db)
+        monkeypatch.setattr(server, "CHANGE_STREAM_RETRY_MIN_DELAY", 0)
+        generation = server.read_cache.generation("quotes")
+        task = asyncio.create_task(server.watch_collection_changes())
+        while len(fake_db.resume_tokens) < 2 or server.read_cache.generation("quotes") < generation + 2:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        assert fake_db.resume_tokens == [None, {"_data": "t1"}]
+
+    asyncio.run(scenario())
+
+
+def request_with_if_none_match(value: str) -> server.Request:
+    return server.Request({"type": "http", "headers": [(b"if-none-match", value.encode())]})
+
+
+def test_etag_matches_parses_if_none_match():
+    etag = '"abc"'
+    assert server.etag_matches(request_with_if_none_match('"abc"'), etag)
+    assert server.etag_matches(request_with_if_none_match('W/"abc"'), etag)
+    assert server.etag_matches(request_with_if_none_match('"x", W/"abc" ,"y"'), etag)
+    assert server.etag_matches(request_with_if_none_match("*"), etag)
+    assert not server.etag_matches(request_with_if_none_match('"abcd"'), etag)
+    assert not server.etag_matches(request_with_if_none_match("abc"), etag)
+    assert not server.etag_matches(server.Request({"type": "http", "headers": []}), etag)
+
+
+def test_conditional_get_returns_304_until_content_changes(mongo_db):
+    async def scenario(http):
+        objection = await create_objection(http, "Дорого")
+        for path in (f"/api/objections/{objection['id']}", "/api/objections", "/api/quotes"):
+            first = await http.get(path)
+            etag = first.headers["etag"]
+            assert first.status_code == 200 and first.headers["cache-control"] == "no-cache"
+
+            cached = await http.get(path, headers={"If-None-Match": etag})
+            assert cached.status_code == 304 and cached.content == b""
+            assert cached.headers["etag"] == etag
+
+            weak = await http.get(path, headers={"If-None-Match": f'W/{etag}, "other"'})
+            assert weak.status_code == 304
+
+        path = f"/api/objections/{objection['id']}"
+        etag = (await http.get(path)).headers["etag"]
+        await http.put(path, json={"title": "Слишком дорого"})
+        changed = await http.get(path, headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.headers["etag"] != etag
+        assert changed.json()["title"] == "Слишком дорого"
+
+    run_with_client(scenario)
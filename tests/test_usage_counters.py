@@ -0,0 +1,164 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+import server
+
+
+def make_buffer() -> server.UsageCounterBuffer:
+    return server.UsageCounterBuffer("objections", flush_interval=60, max_staleness=60)
+
+
+async def usage_counts(db) -> dict:
+    return {doc["id"]: doc["usage_count"] async for doc in db.objections.find({}, {"_id": False})}
+
+
+def fail_second_operation(monkeypatch, db, error):
+    """bulk_write коллекции objections применяет первую операцию и падает с error на второй"""
+    collection_class = type(db.objections)
+    bulk_write = collection_class.bulk_write
+
+    async def partial_bulk_write(collection, operations, ordered=True):
+        if collection.name != "objections":
+            return await bulk_write(collection, operations, ordered=ordered)
+        await bulk_write(collection, operations[:1], ordered=ordered)
+        if isinstance(error, int):
+            raise BulkWriteError({
+                "writeErrors": [{"index": 1, "code": error, "errmsg": f"error {error}"}],
+                "writeConcernErrors": [], "nInserted": 0, "nUpserted": 0, "nMatched": 1,
+                "nModified": 1, "nRemoved": 0, "upserted": [],
+            })
+        raise error
+
+    monkeypatch.setattr(collection_class, "bulk_write", partial_bulk_write)
+
+
+def test_flush_applies_increments(mongo_db):
+    async def scenario():
+        await mongo_db.objections.insert_many([{"id": "a", "usage_count": 0}, {"id": "b", "usage_count": 5}])
+        buffer = make_buffer()
+        for objection_id in ("a", "a", "b"):
+            buffer.add(objection_id)
+        await buffer.flush()
+        assert await usage_counts(mongo_db) == {"a": 2, "b": 6}
+        assert buffer.metrics()["pending_objections"] == 0
+        assert buffer.stats["increments_flushed"] == 3
+
+    asyncio.run(scenario())
+
+
+def test_flush_drops_permanent_write_error_without_reapplying_batch(mongo_db, monkeypatch, caplog):
+    async def scenario():
+        await mongo_db.objections.insert_many([{"id": "good", "usage_count": 1}, {"id": "bad", "usage_count": 1}])
+        buffer = make_buffer()
+        buffer.add("good")
+        buffer.add("bad")
+        # 14 TypeMismatch: $inc по нечисловому usage_count никогда не пройдет
+        fail_second_operation(monkeypatch, mongo_db, 14)
+        with caplog.at_level(logging.ERROR, logger=server.logger.name):
+            await buffer.flush()
+            await buffer.flush()
+        assert await usage_counts(mongo_db) == {"good": 2, "bad": 1}
+        assert buffer.pending == {} and buffer.pending_hours == {}
+        assert buffer.stats["increments_dropped"] == 1
+        assert buffer.stats["increments_flushed"] == 1
+        assert "bad" in caplog.text
+
+    asyncio.run(scenario())
+
+
+def test_flush_requeues_only_retryable_write_errors(mongo_db, monkeypatch):
+    async def scenario():
+        await mongo_db.objections.insert_many([{"id": "good", "usage_count": 1}, {"id": "busy", "usage_count": 1}])
+        buffer = make_buffer()
+        buffer.add("good")
+        buffer.add("busy")
+        fail_second_operation(monkeypatch, mongo_db, 112)
+        await buffer.flush()
+        monkeypatch.undo()
+        assert list(buffer.pending) == ["busy"]
+        assert [hour_key[0] for hour_key in buffer.pending_hours] == ["busy"]
+        await buffer.flush()
+        assert await usage_counts(mongo_db) == {"good": 2, "busy": 2}
+        assert buffer.pending == {}
+
+    asyncio.run(scenario())
+
+
+def test_flush_requeues_batch_on_connection_failure(mongo_db, monkeypatch):
+    async def scenario():
+        await mongo_db.objections.insert_many([{"id": "a", "usage_count": 0}])
+        buffer = make_buffer()
+        buffer.add("a")
+        collection_class = type(mongo_db.objections)
+
+        async def unreachable(collection, operations, ordered=True):
+            raise AutoReconnect("connection reset")
+
+        monkeypatch.setattr(collection_class, "bulk_write", unreachable)
+        await buffer.flush()
+        monkeypatch.undo()
+        assert buffer.pending["a"][0] == 1
+        await buffer.flush()
+        assert await usage_counts(mongo_db) == {"a": 1}
+
+    asyncio.run(scenario())
+
+
+def test_flush_does_not_reapply_batch_after_unexpected_error(mongo_db):
+    async def scenario():
+        # mongomock прерывает пакет исключением на документе, где $inc невозможен
+        await mongo_db.objections.insert_many([{"id": "good", "usage_count": 1}, {"id": "bad", "usage_count": "x"}])
+        buffer = make_buffer()
+        buffer.add("good")
+        buffer.add("bad")
+        for _ in range(3):
+            await buffer.flush()
+        assert (await usage_counts(mongo_db))["good"] == 2
+        assert buffer.pending == {}
+
+    asyncio.run(scenario())
+
+
+def test_flush_does_not_move_updated_at_backwards(mongo_db):
+    async def scenario():
+        await mongo_db.objections.insert_one({"id": "a", "usage_count": 0, "updated_at": datetime(2024, 1, 1)})
+        buffer = make_buffer()
+        buffer.add("a")
+        # PUT после инкремента выставляет более позднее updated_at
+        edited_at = datetime.utcnow() + timedelta(seconds=5)
+        await mongo_db.objections.update_one({"id": "a"}, {"$set": {"updated_at": edited_at}})
+        await buffer.flush()
+        doc = await mongo_db.objections.find_one({"id": "a"})
+        assert doc["usage_count"] == 1
+        assert abs(doc["updated_at"] - edited_at) < timedelta(milliseconds=1)
+
+    asyncio.run(scenario())
+
+
+def test_stop_waits_for_flush_in_progress(mongo_db, monkeypatch):
+    async def scenario():
+        await mongo_db.objections.insert_many([{"id": "a", "usage_count": 0}, {"id": "b", "usage_count": 0}])
+        collection_class = type(mongo_db.objections)
+        bulk_write = collection_class.bulk_write
+        started = asyncio.Event()
+
+        async def slow_bulk_write(collection, operations, ordered=True):
+            if collection.name == "objections":
+                started.set()
+                await asyncio.sleep(0.05)
+            return await bulk_write(collection, operations, ordered=ordered)
+
+        monkeypatch.setattr(collection_class, "bulk_write", slow_bulk_write)
+        buffer = server.UsageCounterBuffer("objections", flush_interval=0.01, max_staleness=60)
+        buffer.add("a")
+        buffer.add("b")
+        buffer.start()
+        await started.wait()
+        await buffer.stop()
+        assert await usage_counts(mongo_db) == {"a": 1, "b": 1}
+        assert buffer.pending == {}
+
+    asyncio.run(scenario())